@@ -74,7 +74,8 @@ def get_settings() -> Settings:
         host=os.getenv("HOST", "0.0.0.0"),
         port=int(os.getenv("PORT", "8000")),
         reload=os.getenv("RELOAD", "false").lower() == "true",
-        conversations_db_url=os.getenv("CONVERSATIONS_DB_URL", "sqlite+aiosqlite:///conversations.db"),
+        # DATABASE_URL (e.g. postgresql+asyncpg://...) takes precedence over CONVERSATIONS_DB_URL
+        conversations_db_url=os.getenv("DATABASE_URL") or os.getenv("CONVERSATIONS_DB_URL", "sqlite+aiosqlite:///conversations.db"),
         kv_store_db_path=os.getenv("KV_STORE_DB_PATH", "data.db"),
         static_directory=os.getenv("STATIC_DIRECTORY", "frontend/dist"),
         tools_directory=os.getenv("TOOLS_DIRECTORY", "tools"),
@@ -42,6 +42,8 @@ from services.tool_service import tool_service
 from services.log_service import logger
 from services.state_service import state_service
 from services.data_access_service import data_access_service
+from services.chat_service import chat_service
+from services.conversation_service import conversation_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -56,7 +58,7 @@ async def lifespan(app: FastAPI):
         
         # Initialize main database
         logger.info("Initializing database...")
-        await data_access_service.initialize()
+        await data_access_service.initialize(settings.conversations_db_url)
         
         # Load tools
         logger.info("Loading tools...")
@@ -96,6 +98,18 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"KV watcher shutdown failed: {e}")
         
+        # Let background conversation cleanups finish
+        try:
+            await conversation_service.wait_for_background_tasks()
+        except Exception as e:
+            logger.warning(f"Background task shutdown failed: {e}")
+        
+        # Persist any pending enabled-tools change
+        try:
+            await tool_service.flush_enabled_tools()
+        except Exception as e:
+            logger.warning(f"Enabled tools flush failed: {e}")
+        
         # Run tool cleanup
         logger.info("Running tool cleanup...")
         try:
@@ -103,6 +117,18 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.warning(f"Tool cleanup failed: {e}")
         
+        # Close pooled OpenAI HTTP clients
+        try:
+            await chat_service.close_openai_clients()
+        except Exception as e:
+            logger.warning(f"OpenAI client shutdown failed: {e}")
+        
+        # Close the shared KV store connection
+        try:
+            await kv_store.close()
+        except Exception as e:
+            logger.warning(f"KV store shutdown failed: {e}")
+        
         logger.info("Shutdown complete")
         
     except Exception as e:
@@ -4,7 +4,6 @@ Chat API router for Ghostpad.
 Handles chat message creation, streaming, regeneration, and title generation.
 """
 
-import json
 from typing import Optional
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
@@ -15,6 +14,7 @@ from services.conversation_service import conversation_service
 from services.sse_service import sse_service
 from services.suggestion_service import suggestion_service
 from utils.constants import MIME_EVENT_STREAM
+from utils.json_utils import dumps
 
 router = APIRouter()
 
@@ -123,7 +123,7 @@ async def stream_chat_message(data: ChatMessageCreate):
                 yield sse_event
 
         except Exception as e:
-            yield f"data: {json.dumps({'error': f'Chat error: {str(e)}'})}\n\n"
+            yield f"data: {dumps({'error': f'Chat error: {str(e)}'})}\n\n"
 
     return StreamingResponse(
         generate_stream(), media_type=MIME_EVENT_STREAM, headers=sse_headers
@@ -155,7 +155,7 @@ async def regenerate_message(data: RegenerateRequest):
                     ):
                         yield sse_event
                 except Exception as e:
-                    yield f"data: {json.dumps({'error': f'Regeneration error: {str(e)}'})}\n\n"
+                    yield f"data: {dumps({'error': f'Regeneration error: {str(e)}'})}\n\n"
 
             return StreamingResponse(
                 regenerate_stream(),
@@ -10,6 +10,7 @@ from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 
 from services.ai_service import ai_service
+from services.chat_service import chat_service
 from services.system_prompt_service import system_prompt_service
 
 router = APIRouter()
@@ -101,6 +102,8 @@ async def save_openai_settings(settings: OpenAISettings):
             model_name=settings.model_name,
             streaming_enabled=settings.streaming_enabled
         )
+        # Drop pooled clients for replaced keys/endpoints; ones still streaming close when done
+        await chat_service.retire_openai_clients(settings.api_key, settings.base_url)
         return OpenAISettingsResponse(**saved_settings)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save OpenAI settings: {str(e)}")
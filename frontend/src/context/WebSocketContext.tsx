@@ -68,16 +68,11 @@ class WebSocketManager {
           const message = JSON.parse(event.data);
 
           // Broadcast to all relevant subscribers
-          if (message.type === "kv_update" && message.key) {
-            const specificSubscribers = this.subscribers.get(message.key);
-            if (specificSubscribers) {
-              specificSubscribers.forEach((callback) => callback(message));
-            }
-
-            const wildcardSubscribers = this.subscribers.get("*");
-            if (wildcardSubscribers) {
-              wildcardSubscribers.forEach((callback) => callback(message));
-            }
+          if (message.type === "kv_batch" && Array.isArray(message.updates)) {
+            // Several KV changes coalesced into one frame; dispatch each as a kv_update
+            message.updates.forEach((update: any) => this.dispatchKvUpdate(update));
+          } else if (message.type === "kv_update" && message.key) {
+            this.dispatchKvUpdate(message);
           } else {
             // Broadcast other message types to all subscribers
             this.subscribers.forEach((subscribers) => {
@@ -116,6 +111,20 @@ class WebSocketManager {
     }
   }
 
+  private dispatchKvUpdate(message: any) {
+    if (!message.key) return;
+
+    const specificSubscribers = this.subscribers.get(message.key);
+    if (specificSubscribers) {
+      specificSubscribers.forEach((callback) => callback(message));
+    }
+
+    const wildcardSubscribers = this.subscribers.get("*");
+    if (wildcardSubscribers) {
+      wildcardSubscribers.forEach((callback) => callback(message));
+    }
+  }
+
   disconnect() {
     if (this.reconnectTimeout) {
       clearTimeout(this.reconnectTimeout);
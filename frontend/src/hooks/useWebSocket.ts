@@ -98,7 +98,14 @@ export function useWebSocket({
       ws.onmessage = (event) => {
         try {
           const message = JSON.parse(event.data) as WebSocketMessage;
-          onMessageRef.current?.(message);
+          if (message.type === "kv_batch" && Array.isArray(message.updates)) {
+            // Several KV changes coalesced into one frame; deliver each as a kv_update
+            message.updates.forEach((update: WebSocketMessage) =>
+              onMessageRef.current?.(update)
+            );
+          } else {
+            onMessageRef.current?.(message);
+          }
         } catch (error) {
           console.error("Failed to parse WebSocket message:", error);
         }
@@ -2,6 +2,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
@@ -31,6 +32,10 @@ class MessageAttachment(Base):
         UniqueConstraint(
             "message_id", "entity_type", "entity_id", name="uq_message_entity"
         ),
+        # Covers the per-conversation message lookups, counts and ordering
+        Index(
+            "ix_msgattach_entity_seq", "entity_type", "entity_id", "sequence_order"
+        ),
     )
 
     def __repr__(self):
@@ -36,10 +36,12 @@ class AIService:
         streaming_enabled: bool = True,
     ) -> Dict[str, Any]:
         """Save OpenAI API settings."""
-        await kv_store.set("openai_base_url", base_url)
-        await kv_store.set("openai_api_key", api_key)
-        await kv_store.set("openai_model_name", model_name)
-        await kv_store.set("openai_streaming_enabled", streaming_enabled)
+        await kv_store.set_many({
+            "openai_base_url": base_url,
+            "openai_api_key": api_key,
+            "openai_model_name": model_name,
+            "openai_streaming_enabled": streaming_enabled,
+        })
 
         return {
             "base_url": base_url,
@@ -121,11 +123,13 @@ class AIService:
         seed: int = None,
     ) -> Dict[str, Any]:
         """Save sampling parameters."""
-        await kv_store.set("sampling_temperature", temperature)
-        await kv_store.set("sampling_top_p", top_p)
-        await kv_store.set("sampling_max_tokens", max_tokens)
-        await kv_store.set("sampling_frequency_penalty", frequency_penalty)
-        await kv_store.set("sampling_presence_penalty", presence_penalty)
+        await kv_store.set_many({
+            "sampling_temperature": temperature,
+            "sampling_top_p": top_p,
+            "sampling_max_tokens": max_tokens,
+            "sampling_frequency_penalty": frequency_penalty,
+            "sampling_presence_penalty": presence_penalty,
+        })
 
         # Save optional parameters
         if seed is not None:
@@ -22,24 +22,45 @@ This service handles:
 
 from services.data_access_service import with_db_session
 from utils.constants import ERROR_MESSAGE_NOT_FOUND, ERROR_MESSAGE_NOT_FOUND_REGEN, ERROR_NO_OPENAI_API_KEY
-from .tool_service import tool_service
+from .tool_service import tool_service, run_tool_cleanups
 from .persona_service import persona_service
 from .system_prompt_service import system_prompt_service
 from .ai_service import ai_service
 from .kv_store_service import kv_store
+from .rate_limit_service import rate_limit_service
 from models import Conversation, Message, MessageAttachment
 from utils.response_context import ResponseContext
 from openai import AsyncOpenAI
+import httpx
 from sqlalchemy import select, func
-from typing import Dict, Any, List, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, Callable
 from datetime import datetime
+from functools import partial
+from dataclasses import dataclass
+from types import SimpleNamespace
+from urllib.parse import urlparse
 import inspect
 import asyncio
 import json
+import logging
+
+logger = logging.getLogger("ghostpad.chat")
+
+
+# Connection pool settings for the shared OpenAI HTTP clients
+OPENAI_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+OPENAI_HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+
+def _has_placeholders(content: Optional[str]) -> bool:
+    """Cheap check for {{...}} / [[...]] placeholder tokens before doing lookups."""
+    return bool(content) and ("{{" in content or "[[" in content)
 
 
 async def replace_message_placeholders(content: str, conversation_id: str) -> str:
     """Replace {{user}} and {{char}} placeholders in message content."""
+    if not _has_placeholders(content):
+        return content
     try:
         user_name = await kv_store.get("user_name", "User")
 
@@ -57,7 +78,7 @@ async def replace_message_placeholders(content: str, conversation_id: str) -> st
 
         return processed_content
     except Exception as e:
-        print(f"[DEBUG] Error replacing placeholders: {e}")
+        logger.warning("Error replacing placeholders: %s", e)
         return content  # Return original content if replacement fails
 
 
@@ -66,6 +87,79 @@ class ChatService:
 
     def __init__(self):
         self.tools_limit = 3  # Default tools limit
+        # Stream chunks arriving within this window are merged into one event
+        self.chunk_coalesce_delay = 0.01  # seconds; 0 disables coalescing
+        self.chunk_coalesce_max_chars = 4096
+        self._client_cache: Dict[tuple[str, str], AsyncOpenAI] = {}
+        self._client_lock = asyncio.Lock()
+        # Callers currently using each client; a replaced client is closed after its last user
+        self._client_users: Dict[AsyncOpenAI, int] = {}
+        self._retired_clients: set[AsyncOpenAI] = set()
+
+    async def acquire_openai_client(self, api_key: str, base_url: str) -> AsyncOpenAI:
+        """Get a shared AsyncOpenAI client for these credentials, keeping its connections warm.
+
+        Every acquire must be paired with release_openai_client() once the caller
+        is done with the client, so a settings change never closes it mid-request.
+        """
+        key = (api_key, base_url or None)
+        client = self._client_cache.get(key)
+        if client is None:
+            async with self._client_lock:
+                client = self._client_cache.get(key)
+                if client is None:
+                    client = AsyncOpenAI(
+                        api_key=api_key,
+                        base_url=base_url or None,
+                        http_client=httpx.AsyncClient(
+                            limits=OPENAI_HTTP_LIMITS, timeout=OPENAI_HTTP_TIMEOUT
+                        ),
+                    )
+                    self._client_cache[key] = client
+        self._client_users[client] = self._client_users.get(client, 0) + 1
+        return client
+
+    async def release_openai_client(self, client: AsyncOpenAI) -> None:
+        """Give back a client from acquire_openai_client(), closing it if it was replaced."""
+        users = self._client_users.get(client, 0) - 1
+        if users > 0:
+            self._client_users[client] = users
+            return
+        self._client_users.pop(client, None)
+        if client in self._retired_clients:
+            self._retired_clients.discard(client)
+            await self._close_client(client)
+
+    async def retire_openai_clients(self, api_key: str, base_url: str) -> None:
+        """Drop cached clients for credentials other than these (after a settings change).
+
+        Clients still in use are closed when their last user releases them.
+        """
+        current = (api_key, base_url or None)
+        async with self._client_lock:
+            stale = [key for key in self._client_cache if key != current]
+            clients = [self._client_cache.pop(key) for key in stale]
+        for client in clients:
+            if client in self._client_users:
+                self._retired_clients.add(client)
+            else:
+                await self._close_client(client)
+
+    async def close_openai_clients(self) -> None:
+        """Close and forget all OpenAI clients (on shutdown)."""
+        async with self._client_lock:
+            clients = set(self._client_cache.values()) | self._retired_clients
+            self._client_cache.clear()
+            self._retired_clients.clear()
+            self._client_users.clear()
+        for client in clients:
+            await self._close_client(client)
+
+    async def _close_client(self, client: AsyncOpenAI) -> None:
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning("Error closing OpenAI client: %s", e)
 
     async def _get_next_sequence_order(self, session, conversation_id: str) -> int:
         """Atomically get the next sequence order for a conversation."""
@@ -798,54 +892,95 @@ class ChatService:
         return messages_for_api
 
 
+# Markers of system messages that are rebuilt on every loop iteration
+_TRANSIENT_TOKENS = ("tool(s):", "<STATUS_DASHBOARD>")
+
+
+def _is_transient(message: Dict[str, Any]) -> bool:
+    """Check if a message is a per-iteration tool prompt or status dashboard."""
+    if message.get("role") != "system":
+        return False
+    content = message.get("content") or ""
+    return _TRANSIENT_TOKENS[0] in content or _TRANSIENT_TOKENS[1] in content
+
+
+def _insert_dynamic_context(messages: List[Dict[str, Any]], text: str) -> None:
+    """Add per-iteration context as a system message right after the leading system prompt.
+
+    The stable system prompt stays first, so a provider's cached prefix ends
+    before the text that changes between iterations.
+    """
+    index = 0
+    while index < len(messages) and messages[index].get("role") == "system":
+        index += 1
+    messages.insert(index, {"role": "system", "content": text})
+
+
 async def _prepare_loop_iteration(
     base_messages: List[Dict[str, Any]],
     tools_used: List[str],
     conversation_id: str,
     tools_limit: int,
-    get_enabled_tools,
+    enabled_tools: List[Dict[str, Any]],
     build_tool_prompt,
     run_auto_tools_and_status,
+    tool_cache: Dict[str, Any],
 ) -> Dict[str, Any]:
     """Prepare messages and tools for a single loop iteration.
 
+    enabled_tools is resolved once per inference_loop call; tool_cache is a
+    per-call dict used to memoize the tool prompt and tool schema list.
+
     Returns:
         Dict containing 'messages_for_api' and 'available_tools'
     """
-    print("Going to get enabled tools")
-    enabled_tools = get_enabled_tools()
     num_tools_used = len([name for name in tools_used if name])
-    print("Going to get status section")
-    status_section = await run_auto_tools_and_status(
-        enabled_tools, conversation_id=conversation_id
+    # Start auto tools/status right away so it overlaps the history cleanup and
+    # tool condition checks below; it is only awaited once the prompt is assembled
+    status_task = asyncio.create_task(
+        run_auto_tools_and_status(enabled_tools, conversation_id=conversation_id)
     )
-    print("Going to get other hsit")
 
     # Remove existing tool prompt/status in base messages
-    messages_for_api = [
-        m
-        for m in base_messages
-        if not (
-            m.get("role") == "system"
-            and (
-                "tool(s):" in m.get("content", "")
-                or "<STATUS_DASHBOARD>" in m.get("content", "")
-            )
-        )
-    ]
-    status_message = {"role": "system", "content": status_section}
-    messages_for_api.insert(0, status_message)
+    messages_for_api = [m for m in base_messages if not _is_transient(m)]
 
     # Initialize available_tools list
     available_tools = []
+    tool_prompt = None
 
-    # Only populate tools if limit hasn't been reached
-    if num_tools_used < tools_limit:
-        tool_prompt = build_tool_prompt(tools_used, enabled_tools)
-        messages_for_api.insert(0, {"role": "system", "content": tool_prompt})
-        print(str(tools_limit - num_tools_used) + " left")
-        # Filter available tools
-        available_tools = await _filter_available_tools(enabled_tools, tools_used)
+    try:
+        # Only populate tools if limit hasn't been reached
+        if num_tools_used < tools_limit:
+            # The prompt only depends on the enabled set (fixed for this call)
+            # and which tools have been used, so rebuild it only when that changes
+            prompt_key = frozenset(tools_used)
+            if tool_cache.get("prompt_key") != prompt_key:
+                tool_cache["prompt_key"] = prompt_key
+                tool_cache["tool_prompt"] = build_tool_prompt(tools_used, enabled_tools)
+            tool_prompt = tool_cache["tool_prompt"]
+            logger.debug("%d tool call(s) left", tools_limit - num_tools_used)
+            # Filter available tools, in a stable order for prompt caching.
+            # Conditions can change between iterations, so filtering always
+            # runs, but an unchanged result reuses the previous list object.
+            available_tools = await _filter_available_tools(enabled_tools, tools_used)
+            available_tools.sort(key=lambda t: (t["function"] or {}).get("name") or "")
+            schema_key = tuple((t["function"] or {}).get("name") for t in available_tools)
+            if tool_cache.get("schema_key") == schema_key:
+                available_tools = tool_cache["available_tools"]
+            else:
+                tool_cache["schema_key"] = schema_key
+                tool_cache["available_tools"] = available_tools
+    except BaseException:
+        status_task.cancel()
+        raise
+
+    # Keep the system prompt byte-stable so provider prompt caches can reuse it
+    # across iterations and turns; the per-iteration tool prompt and status
+    # dashboard follow it in their own system message.
+    status_section = await status_task
+    dynamic_context = "\n\n".join(part for part in (tool_prompt, status_section) if part)
+    if dynamic_context:
+        _insert_dynamic_context(messages_for_api, dynamic_context)
 
     return {
         "messages_for_api": messages_for_api,
@@ -855,6 +990,13 @@ async def _prepare_loop_iteration(
     }
 
 
+def _supports_prompt_cache_key(base_url: Optional[str]) -> bool:
+    """Whether the endpoint is OpenAI's own API, which accepts prompt_cache_key."""
+    if not base_url:
+        return True  # the client falls back to api.openai.com
+    return urlparse(base_url).hostname == "api.openai.com"
+
+
 async def _prepare_api_request(
     messages_for_api: List[Dict[str, Any]],
     available_tools: List[Dict[str, Any]],
@@ -866,28 +1008,30 @@ async def _prepare_api_request(
     frequency_penalty: float,
     presence_penalty: float,
     seed: int = None,
+    base_url: str = None,
 ) -> Dict[str, Any]:
     """Build the OpenAI API request parameters."""
 
     # Log all parameters being sent to OpenAI API
-    api_params = {
-        "model": model_name,
-        "temperature": temperature,
-        "top_p": top_p,
-        "max_tokens": max_tokens,
-        "frequency_penalty": frequency_penalty,
-        "presence_penalty": presence_penalty,
-        "tools_count": len(available_tools),
-        "stream": True,
-    }
-    if seed != -1:
-        api_params["seed"] = seed
-    print(f"[OpenAI API Call] Parameters: {api_params}")
+    if logger.isEnabledFor(logging.DEBUG):
+        api_params = {
+            "model": model_name,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+            "tools_count": len(available_tools),
+            "stream": True,
+        }
+        if seed != -1:
+            api_params["seed"] = seed
+        logger.debug("[OpenAI API Call] Parameters: %s", api_params)
 
     # Replace placeholders in messages before sending to API
     processed_messages = []
     for message in messages_for_api:
-        if "content" in message and message["content"]:
+        if _has_placeholders(message.get("content")):
             processed_content = await replace_message_placeholders(
                 message["content"], conversation_id
             )
@@ -897,7 +1041,7 @@ async def _prepare_api_request(
         else:
             processed_messages.append(message)
 
-    print("Preparing response", processed_messages)
+    logger.debug("Preparing response %s", processed_messages)
 
     # Prepare API call parameters
     api_call_params = {
@@ -915,49 +1059,14 @@ async def _prepare_api_request(
     # Add optional parameters if they exist
     if seed is not None:
         api_call_params["seed"] = seed
+    if conversation_id and _supports_prompt_cache_key(base_url):
+        # Lets OpenAI pin the cached prefix per conversation; other
+        # OpenAI-compatible servers may reject the unknown field
+        api_call_params["prompt_cache_key"] = f"ghostpad:{conversation_id}"
 
     return api_call_params
 
 
-def _should_continue_loop(
-    tool_call_detected: bool,
-    streaming_interrupted: bool,
-    tool_call_name: str,
-    collected_args: str,
-    base_messages: List[Dict[str, Any]],
-) -> bool:
-    """Determine if the inference loop should continue.
-
-    Returns:
-        True if loop should continue, False if it should break
-    """
-    # Check for incomplete tool calls
-    if tool_call_detected and not streaming_interrupted:
-        print(
-            "[TOOL_CALL_DEBUG] *** WARNING: Tool call was detected but never completed with finish_reason='tool_calls' ***"
-        )
-        print(
-            f"[TOOL_CALL_DEBUG] Incomplete tool call state: name={tool_call_name}, args='{collected_args}'"
-        )
-
-    # If no tool call was detected, we are done
-    if not tool_call_detected:
-        final_message_tool_calls = len(
-            [
-                m
-                for m in base_messages
-                if m.get("role") == "assistant" and m.get("tool_calls")
-            ]
-        )
-        print(
-            f"[TOOL_CALL_DEBUG] No tool call detected - exiting loop. Final message history has {final_message_tool_calls} assistant messages with tool_calls"
-        )
-        return False  # Break the loop
-
-    # If tool call was detected, continue the loop
-    return True
-
-
 async def _filter_available_tools(
     enabled_tools: List[Dict[str, Any]], tools_used: List[str]
 ) -> List[Dict[str, Any]]:
@@ -987,10 +1096,12 @@ async def _filter_available_tools(
                 if not condition_result:
                     continue  # Skip this tool if condition is False
             except Exception as e:
-                print(f"[Ghostpad] Condition check failed for {name}: {e}")
+                logger.warning("Condition check failed for %s: %s", name, e)
                 continue  # Skip on error
 
-        available_tools.append({"type": "function", "function": t.get("schema")})
+        available_tools.append(
+            t.get("api_tool") or {"type": "function", "function": t.get("schema")}
+        )
 
     return available_tools
 
@@ -1013,51 +1124,69 @@ async def _process_streaming_response(
     model_name: str,
     tools_used: List[str],
     get_tools_registry,
+    response_context: ResponseContext,
+    result: "StreamingResult",
 ) -> AsyncGenerator[Dict[str, Any], None]:
-    """Process the streaming response and detect tool calls."""
+    """Process the streaming response and detect tool calls.
+
+    Only events meant for the client are yielded; the outcome of the stream
+    is written to result once the generator is exhausted.
+    """
     tool_call_detected = False
-    collected_args = ""
+    collected_args_parts: List[str] = []
     tool_call_name = None
     streaming_interrupted = False
-    updated_final_content = final_content
+    # Accumulate content as parts and join only when a full string is needed
+    content_parts: List[str] = [final_content] if final_content else []
 
-    print(
-        f"[TOOL_CALL_DEBUG] Starting streaming response - available_tools count: {len(available_tools)}"
+    logger.debug(
+        "Starting streaming response - available_tools count: %d",
+        len(available_tools),
     )
 
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
     try:
-        async for chunk in response:
-            delta = chunk.choices[0].delta
-            if getattr(delta, "content", None):
+        async for chunk in _coalesce_content_chunks(
+            response,
+            chat_service.chunk_coalesce_delay,
+            chat_service.chunk_coalesce_max_chars,
+        ):
+            choice = chunk.choices[0]
+            delta = choice.delta
+            delta_content = getattr(delta, "content", None)
+            if delta_content:
                 # Stream content only if not in a tool call sequence
                 if not tool_call_detected:
-                    updated_final_content += delta.content
-                    yield {"type": "chunk", "content": delta.content}
+                    content_parts.append(delta_content)
+                    yield {"type": "chunk", "content": delta_content}
                 continue
 
             # Handle tool call streaming
-            tool_call_detected, tool_call_name, collected_args = (
-                _handle_tool_call_streaming(
-                    delta, tool_call_detected, tool_call_name, collected_args
-                )
+            tool_call_detected, tool_call_name = _handle_tool_call_streaming(
+                delta, tool_call_detected, tool_call_name, collected_args_parts
             )
 
-            finish_reason = chunk.choices[0].finish_reason
-            print(
-                f"[TOOL_CALL_DEBUG] Chunk finish_reason: {finish_reason}, tool_call_detected: {tool_call_detected}"
-            )
+            finish_reason = choice.finish_reason
+            if debug_enabled:
+                logger.debug(
+                    "Chunk finish_reason: %s, tool_call_detected: %s",
+                    finish_reason,
+                    tool_call_detected,
+                )
 
             # Check if streaming ended unexpectedly
             if finish_reason and tool_call_detected and finish_reason != "tool_calls":
-                print(
-                    f"[TOOL_CALL_DEBUG] *** WARNING: Tool call streaming ended with unexpected finish_reason: {finish_reason} ***"
+                logger.warning(
+                    "Tool call streaming ended with unexpected finish_reason: %s",
+                    finish_reason,
                 )
                 streaming_interrupted = True
 
             if tool_call_detected and finish_reason == "tool_calls":
                 # Parse tool arguments
+                collected_args = "".join(collected_args_parts)
                 args = _parse_tool_arguments(collected_args)
-                print(f"[DEBUG] Tool call: {tool_call_name} with args: {args}")
+                logger.debug("Tool call: %s with args: %s", tool_call_name, args)
 
                 # Find tool by schema name
                 registry = get_tools_registry()
@@ -1068,7 +1197,8 @@ async def _process_streaming_response(
                 streamed_accumulator = []
                 context_messages_accumulator = []
                 system_messages_accumulator = []
-                response_context = None
+                tool_response_context = None
+                updated_final_content = "".join(content_parts)
 
                 if selected is None:
                     tool_result = f"Unknown function: {tool_call_name}"
@@ -1081,6 +1211,7 @@ async def _process_streaming_response(
                         model_name,
                         tools_used,
                         updated_final_content,
+                        response_context,
                     ):
                         if event["type"] == "tool_execution_complete":
                             # Extract results from tool execution
@@ -1093,84 +1224,212 @@ async def _process_streaming_response(
                                 "system_messages_accumulator"
                             ]
                             updated_final_content = event["updated_final_content"]
-                            response_context = event["response_context"]
+                            tool_response_context = event["response_context"]
                         else:
                             # Forward streaming events
                             yield event
 
                 # Return tool execution results
-                yield {
-                    "type": "tool_call_complete",
+                result.tool_call_detected = True
+                result.tool_call_name = tool_call_name
+                result.collected_args = collected_args
+                result.updated_final_content = updated_final_content
+                result.tool_call = {
                     "tool_call_name": tool_call_name,
                     "tool_result": tool_result,
                     "streamed_accumulator": streamed_accumulator,
                     "context_messages_accumulator": context_messages_accumulator,
                     "system_messages_accumulator": system_messages_accumulator,
                     "updated_final_content": updated_final_content,
-                    "response_context": response_context,
+                    "response_context": tool_response_context,
                     "args": args,
                 }
                 return
 
     except Exception as streaming_error:
-        print(f"[TOOL_CALL_DEBUG] *** STREAMING EXCEPTION: {streaming_error} ***")
-        print("[TOOL_CALL_DEBUG] State when exception occurred:")
-        print(f"[TOOL_CALL_DEBUG]   - tool_call_detected: {tool_call_detected}")
-        print(f"[TOOL_CALL_DEBUG]   - tool_call_name: {tool_call_name}")
-        print(f"[TOOL_CALL_DEBUG]   - collected_args: '{collected_args}'")
-        print(f"[TOOL_CALL_DEBUG]   - collected_args_length: {len(collected_args)}")
+        collected_args = "".join(collected_args_parts)
+        logger.error(
+            "Streaming exception: %s (tool_call_detected=%s, tool_call_name=%s, "
+            "collected_args='%s', collected_args_length=%d)",
+            streaming_error,
+            tool_call_detected,
+            tool_call_name,
+            collected_args,
+            len(collected_args),
+        )
 
         # If we were in the middle of a tool call, this is likely the diff error
         if tool_call_detected:
-            print(
-                "[TOOL_CALL_DEBUG] *** LIKELY CAUSE: llama.cpp diff error during tool call streaming ***"
+            logger.error(
+                "Tool call was incomplete when streaming crashed - likely a llama.cpp diff error during tool call streaming"
             )
-            print("[TOOL_CALL_DEBUG] Tool call was incomplete when streaming crashed")
 
         # Re-raise to maintain error behavior but with better context
         raise streaming_error
 
-    # Return final results if no tool call was detected
-    yield {
-        "type": "streaming_complete",
-        "tool_call_detected": tool_call_detected,
-        "streaming_interrupted": streaming_interrupted,
-        "tool_call_name": tool_call_name,
-        "collected_args": collected_args,
-        "updated_final_content": updated_final_content,
-    }
+    # Return final results if no tool call was completed
+    result.tool_call_detected = tool_call_detected
+    result.streaming_interrupted = streaming_interrupted
+    result.tool_call_name = tool_call_name
+    result.collected_args = "".join(collected_args_parts)
+    result.updated_final_content = "".join(content_parts)
+
+
+class _MergedContentChunk:
+    """Stand-in for several consecutive content-only stream chunks."""
+
+    __slots__ = ("choices",)
+
+    def __init__(self, content: str):
+        self.choices = [
+            SimpleNamespace(
+                delta=SimpleNamespace(content=content, tool_calls=None),
+                finish_reason=None,
+            )
+        ]
+
+
+def _is_plain_content_chunk(chunk) -> bool:
+    """Check if a stream chunk only carries assistant text."""
+    if not chunk.choices:
+        return False
+    choice = chunk.choices[0]
+    delta = choice.delta
+    return (
+        choice.finish_reason is None
+        and bool(getattr(delta, "content", None))
+        and not getattr(delta, "tool_calls", None)
+    )
+
+
+async def _coalesce_content_chunks(stream, max_delay: float, max_chars: int):
+    """Merge content-only chunks arriving within max_delay seconds into one chunk.
+
+    Cuts the number of events (and SSE writes) per response without adding
+    noticeable latency. Chunks carrying tool calls or a finish_reason are
+    passed through unchanged, after any buffered text. The upstream iterator
+    is advanced in a task so waiting for the next chunk never cancels it.
+    """
+    if max_delay <= 0:
+        async for chunk in stream:
+            yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    iterator = stream.__aiter__()
+    pending = None
+    buffer: List[str] = []
+    buffered_chars = 0
+    deadline = 0.0
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            if buffer:
+                timeout = deadline - loop.time()
+                if timeout > 0:
+                    await asyncio.wait((pending,), timeout=timeout)
+                if not pending.done():
+                    yield _MergedContentChunk("".join(buffer))
+                    buffer = []
+                    buffered_chars = 0
+                    continue
+            try:
+                chunk = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                if pending.done():
+                    pending = None
+
+            if _is_plain_content_chunk(chunk):
+                content = chunk.choices[0].delta.content
+                if not buffer:
+                    deadline = loop.time() + max_delay
+                buffer.append(content)
+                buffered_chars += len(content)
+                if buffered_chars >= max_chars:
+                    yield _MergedContentChunk("".join(buffer))
+                    buffer = []
+                    buffered_chars = 0
+                continue
+
+            if buffer:
+                yield _MergedContentChunk("".join(buffer))
+                buffer = []
+                buffered_chars = 0
+            yield chunk
+
+        if buffer:
+            yield _MergedContentChunk("".join(buffer))
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+
+
+@dataclass
+class StreamingResult:
+    """Outcome of a single streamed completion, filled in by _process_streaming_response."""
+
+    tool_call_detected: bool = False
+    streaming_interrupted: bool = False
+    tool_call_name: Optional[str] = None
+    collected_args: str = ""
+    updated_final_content: str = ""
+    tool_call: Optional[Dict[str, Any]] = None
 
 
 def _handle_tool_call_streaming(
-    delta, tool_call_detected: bool, tool_call_name: Optional[str], collected_args: str
-) -> tuple[bool, Optional[str], str]:
-    """Handle tool call argument collection from streaming chunks."""
-    if getattr(delta, "tool_calls", None):
-        tool_call_detected = True
-        print(
-            f"[TOOL_CALL_DEBUG] Tool call detected in streaming chunk - delta.tool_calls count: {len(delta.tool_calls)}"
+    delta,
+    tool_call_detected: bool,
+    tool_call_name: Optional[str],
+    collected_args_parts: List[str],
+) -> tuple[bool, Optional[str]]:
+    """Handle tool call argument collection from streaming chunks.
+
+    Argument fragments are appended to collected_args_parts in place and joined
+    once the tool call completes.
+    """
+    tool_calls = getattr(delta, "tool_calls", None)
+    if not tool_calls:
+        return tool_call_detected, tool_call_name
+
+    tool_call_detected = True
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    if debug_enabled:
+        logger.debug(
+            "Tool call detected in streaming chunk - delta.tool_calls count: %d",
+            len(tool_calls),
         )
-        for tc in delta.tool_calls:
-            if tc.function:
-                if tool_call_name is None:
-                    tool_call_name = tc.function.name
-                    print(
-                        f"[TOOL_CALL_DEBUG] First tool call detected: {tc.function.name}"
-                    )
-                if tc.function.arguments:
-                    collected_args += tc.function.arguments
-                    print(
-                        f"[TOOL_CALL_DEBUG] Collecting args chunk: '{tc.function.arguments}', total length now: {len(collected_args)}"
-                    )
+    for tc in tool_calls:
+        fn = tc.function
+        if not fn:
+            continue
+        if tool_call_name is None:
+            tool_call_name = fn.name
+            logger.debug("First tool call detected: %s", tool_call_name)
+        arguments = fn.arguments
+        if arguments:
+            collected_args_parts.append(arguments)
+            if debug_enabled:
+                logger.debug(
+                    "Collecting args chunk: '%s', chunks collected: %d",
+                    arguments,
+                    len(collected_args_parts),
+                )
 
-    return tool_call_detected, tool_call_name, collected_args
+    return tool_call_detected, tool_call_name
 
 
 async def _process_tool_call_completion(
     event: Dict[str, Any],
     base_messages: List[Dict[str, Any]],
     tools_used: List[str],
-    tool_call_results: List[str],
+    tool_call_results: List[Callable[[], str]],
     conversation_id: str,
     collected_args: str,
 ) -> tuple[bool, bool, str]:
@@ -1194,14 +1453,9 @@ async def _process_tool_call_completion(
     # Track usage
     tools_used.append(tool_call_name or "")
 
-    # Build parameter string for logging
-    param_str = (
-        ", ".join(f"{k}={json.dumps(v)}" for k, v in (args or {}).items())
-        if args
-        else "(no parameters)"
-    )
+    # Record the call; the summary string is only formatted if someone reads it
     tool_call_results.append(
-        f"[{datetime.now().isoformat()}] You called `{tool_call_name}` with parameters: {param_str}."
+        partial(_format_tool_call_result, datetime.now(), tool_call_name, args)
     )
 
     # Clean up old tool call history messages
@@ -1287,6 +1541,18 @@ async def _process_tool_call_completion(
     return tool_call_detected, streaming_interrupted, final_content
 
 
+def _format_tool_call_result(
+    called_at: datetime, tool_call_name: Optional[str], args: Dict[str, Any]
+) -> str:
+    """Format a tool call summary line for the tool call history."""
+    param_str = (
+        ", ".join(f"{k}={json.dumps(v)}" for k, v in args.items())
+        if args
+        else "(no parameters)"
+    )
+    return f"[{called_at.isoformat()}] You called `{tool_call_name}` with parameters: {param_str}."
+
+
 def _parse_tool_arguments(collected_args: str) -> Dict[str, Any]:
     """Parse and validate tool call arguments from JSON."""
     try:
@@ -1307,16 +1573,19 @@ def _parse_tool_arguments(collected_args: str) -> Dict[str, Any]:
             if first_json_end > 0:
                 first_json = collected_args[:first_json_end]
                 args = json.loads(first_json)
-                print(
-                    f"[DEBUG] Extracted first JSON: '{first_json}', parsed args: {args}"
+                logger.debug(
+                    "Extracted first JSON: '%s', parsed args: %s", first_json, args
                 )
             else:
                 args = json.loads(collected_args)
         else:
             args = {}
     except Exception as e:
-        print(
-            f"[TOOL_CALL_DEBUG] JSON parse error: {e}, collected_args was: '{collected_args}', length: {len(collected_args)}"
+        logger.warning(
+            "Tool call JSON parse error: %s, collected_args was: '%s', length: %d",
+            e,
+            collected_args,
+            len(collected_args),
         )
         args = {}
 
@@ -1330,18 +1599,17 @@ async def _execute_tool_function(
     model_name: str,
     tools_used: List[str],
     final_content: str,
+    response_context: ResponseContext,
 ) -> AsyncGenerator[Dict[str, Any], None]:
-    """Execute a tool function and handle streaming/system content."""
-    tool_fn = tool.get("function")
+    """Execute a tool function and handle streaming/system content.
 
-    # Create response context for tool streaming
-    inference_context = {
-        "tool_streamed_content": [],
-        "system_streamed_content": [],
-        "final_content": final_content,
-    }
+    response_context is shared across tool calls in a turn and is reset here.
+    """
+    tool_fn = tool.get("function")
 
-    response_context = ResponseContext(inference_context)
+    # Reuse the turn's response context for tool streaming
+    response_context.reset(final_content)
+    inference_context = response_context.get_inference_context()
 
     # Create metadata object for tools that support it
     metadata = {
@@ -1360,7 +1628,7 @@ async def _execute_tool_function(
     if supports_metadata:
         tool_kwargs["metadata"] = metadata
 
-    print(f"[DEBUG] Final tool_kwargs: {tool_kwargs}")
+    logger.debug("Final tool_kwargs: %s", tool_kwargs)
 
     # Call the tool function
     if inspect.iscoroutinefunction(tool_fn):
@@ -1375,7 +1643,7 @@ async def _execute_tool_function(
     context_messages_accumulator = []
     system_chunks_from_generator = []
     context_chunks_from_generator = []
-    updated_final_content = final_content
+    content_parts: List[str] = [final_content] if final_content else []
 
     # Check if the tool result is a generator (for real-time streaming)
     if hasattr(tool_result, "__aiter__") or hasattr(tool_result, "__iter__"):
@@ -1383,9 +1651,9 @@ async def _execute_tool_function(
         system_content = response_context.get_system_content()
         if system_content:
             # Tool used system streaming - flush assistant message first, then stream system
-            if updated_final_content.strip():
-                yield {"type": "assistant_complete", "content": updated_final_content}
-                updated_final_content = ""  # Reset for potential continuation
+            if final_content.strip():
+                yield {"type": "assistant_complete", "content": final_content}
+                content_parts = []  # Reset for potential continuation
 
             yield {"type": "system_message_start"}
             yield {"type": "system_chunk", "content": system_content}
@@ -1407,7 +1675,7 @@ async def _execute_tool_function(
                             context_chunks_from_generator.append(chunk.content)
                         else:  # assistant chunk
                             processed_chunk_content = await replace_message_placeholders(chunk.content, conversation_id)
-                            updated_final_content += processed_chunk_content
+                            content_parts.append(processed_chunk_content)
                             streamed_accumulator.append(processed_chunk_content)
                             yield {"type": "chunk", "content": processed_chunk_content}
             else:
@@ -1424,7 +1692,7 @@ async def _execute_tool_function(
                             context_chunks_from_generator.append(chunk.content)
                         else:  # assistant chunk
                             processed_chunk_content = await replace_message_placeholders(chunk.content, conversation_id)
-                            updated_final_content += processed_chunk_content
+                            content_parts.append(processed_chunk_content)
                             streamed_accumulator.append(processed_chunk_content)
                             yield {"type": "chunk", "content": processed_chunk_content}
 
@@ -1450,9 +1718,9 @@ async def _execute_tool_function(
         system_content = response_context.get_system_content()
         if system_content:
             # Flush current assistant message before system message
-            if updated_final_content.strip():
-                yield {"type": "assistant_complete", "content": updated_final_content}
-                updated_final_content = ""  # Reset for potential continuation
+            if final_content.strip():
+                yield {"type": "assistant_complete", "content": final_content}
+                content_parts = []  # Reset for potential continuation
 
             yield {"type": "system_message_start"}
             yield {"type": "system_chunk", "content": system_content}
@@ -1461,14 +1729,14 @@ async def _execute_tool_function(
         # Process any streamed content from the tool (via ResponseContext) - still goes to assistant
         if inference_context.get("tool_streamed_content"):
             for streamed_chunk in inference_context["tool_streamed_content"]:
-                updated_final_content += streamed_chunk
+                content_parts.append(streamed_chunk)
                 streamed_accumulator.append(streamed_chunk)
                 yield {"type": "chunk", "content": streamed_chunk}
 
         # Process any final content appended to the response
         final_content_from_tool = response_context.get_final_content()
         if final_content_from_tool:
-            updated_final_content += final_content_from_tool
+            content_parts.append(final_content_from_tool)
             streamed_accumulator.append(final_content_from_tool)
             yield {"type": "chunk", "content": final_content_from_tool}
 
@@ -1479,7 +1747,7 @@ async def _execute_tool_function(
         "streamed_accumulator": streamed_accumulator,
         "system_messages_accumulator": system_messages_accumulator,
         "context_messages_accumulator": context_messages_accumulator,
-        "updated_final_content": updated_final_content,
+        "updated_final_content": "".join(content_parts),
         "response_context": response_context,
     }
 
@@ -1510,50 +1778,55 @@ async def inference_loop(
     - 'chunk': has 'content'
     - 'complete': has 'content' (full final content)
     """
+    client = None
     try:
-        client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+        client = await chat_service.acquire_openai_client(api_key, base_url)
+        limiter = rate_limit_service.get_limiter(base_url, model_name)
         yield {"type": "start"}
 
         tools_used: List[str] = []
-        tool_call_results: List[str] = []
+        tool_call_results: List[Callable[[], str]] = []
         final_content: str = ""
 
-        # Track tool call state for validation
-        previous_tool_call_count = 0
+        # One response context per turn, reset before each tool call
+        response_context = ResponseContext(
+            {
+                "tool_streamed_content": [],
+                "system_streamed_content": [],
+                "final_content": final_content,
+            }
+        )
+
+        # Running count of assistant messages carrying tool_calls, kept up to
+        # date as tool calls are committed instead of rescanning the history
+        assistant_tool_call_count = sum(
+            1
+            for m in base_messages
+            if m.get("role") == "assistant" and m.get("tool_calls")
+        )
         loop_iteration = 0
 
+        # The enabled tool set is resolved once for the whole response
+        enabled_tools = get_enabled_tools()
+        tool_cache: Dict[str, Any] = {}
+
         while True:
             loop_iteration += 1
-            print(f"[TOOL_CALL_DEBUG] === LOOP ITERATION {loop_iteration} START ===")
+            logger.debug("=== LOOP ITERATION %d START ===", loop_iteration)
             # Prepare loop iteration
             iteration_data = await _prepare_loop_iteration(
                 base_messages,
                 tools_used,
                 conversation_id,
                 tools_limit,
-                get_enabled_tools,
+                enabled_tools,
                 build_tool_prompt,
                 run_auto_tools_and_status,
+                tool_cache,
             )
 
             messages_for_api = iteration_data["messages_for_api"]
             available_tools = iteration_data["available_tools"]
-            enabled_tools = iteration_data["enabled_tools"]
-
-            # LOG: Track message state at start of loop
-            current_msg_tool_calls = sum(
-                1
-                for msg in messages_for_api
-                if msg.get("role") == "assistant" and msg.get("tool_calls")
-            )
-
-            # VALIDATION: Check if tool calls decreased from previous iteration
-            if current_msg_tool_calls < previous_tool_call_count:
-                print(
-                    f"[TOOL_CALL_DEBUG] *** WARNING: TOOL CALL COUNT DECREASED! Previous: {previous_tool_call_count}, Current: {current_msg_tool_calls} ***"
-                )
-
-            previous_tool_call_count = current_msg_tool_calls
 
             # Prepare API request
             api_call_params = await _prepare_api_request(
@@ -1567,14 +1840,20 @@ async def inference_loop(
                 frequency_penalty,
                 presence_penalty,
                 seed,
+                base_url,
             )
 
-            response = await client.chat.completions.create(**api_call_params)
+            stream_result = StreamingResult()
 
-            tool_call_detected = False
-            collected_args = ""
-            tool_call_name = None
-            streaming_interrupted = False
+            # The limiter adapts to 429/5xx responses and rate limit headers. It only
+            # covers admission (the request and its headers), so streaming, tool
+            # execution and slow clients never hold a slot others are waiting for.
+            async with limiter:
+                raw_response = await client.chat.completions.with_raw_response.create(
+                    **api_call_params
+                )
+                limiter.observe(raw_response.headers)
+            response = raw_response.parse()
 
             # Process streaming response using extracted method
             async for event in _process_streaming_response(
@@ -1585,50 +1864,46 @@ async def inference_loop(
                 model_name,
                 tools_used,
                 get_tools_registry,
+                response_context,
+                stream_result,
             ):
-                if event["type"] == "tool_call_complete":
-                    # Process tool call completion using extracted method
-                    tool_call_detected, streaming_interrupted, final_content = (
-                        await _process_tool_call_completion(
-                            event,
-                            base_messages,
-                            tools_used,
-                            tool_call_results,
-                            conversation_id,
-                            collected_args,
-                        )
+                yield event
+
+            final_content = stream_result.updated_final_content
+
+            # Only a completed tool call needs a follow-up request; stop before
+            # doing any more preparation work otherwise
+            if stream_result.tool_call is None:
+                if stream_result.tool_call_detected:
+                    logger.warning(
+                        "Tool call was detected but never completed with finish_reason='tool_calls' (interrupted=%s)",
+                        stream_result.streaming_interrupted,
                     )
-                    continue
-                elif event["type"] == "streaming_complete":
-                    # Handle case where no tool call was detected
-                    tool_call_detected = event["tool_call_detected"]
-                    streaming_interrupted = event["streaming_interrupted"]
-                    tool_call_name = event["tool_call_name"]
-                    collected_args = event["collected_args"]
-                    final_content = event["updated_final_content"]
-                else:
-                    # Forward other events (like chunks)
-                    yield event
-
-            # Check if loop should continue
-            if not _should_continue_loop(
-                tool_call_detected,
-                streaming_interrupted,
-                tool_call_name,
-                collected_args,
-                base_messages,
-            ):
+                    logger.debug(
+                        "Incomplete tool call state: name=%s, args='%s'",
+                        stream_result.tool_call_name,
+                        stream_result.collected_args,
+                    )
+                logger.debug(
+                    "No completed tool call - exiting loop. Final message history has %d assistant messages with tool_calls",
+                    assistant_tool_call_count,
+                )
                 break
 
-        completion_message_tool_calls = len(
-            [
-                m
-                for m in base_messages
-                if m.get("role") == "assistant" and m.get("tool_calls")
-            ]
-        )
-        print(
-            f"[TOOL_CALL_DEBUG] Inference complete - final message history has {completion_message_tool_calls} assistant messages with tool_calls"
+            # Process tool call completion using extracted method
+            _, _, final_content = await _process_tool_call_completion(
+                stream_result.tool_call,
+                base_messages,
+                tools_used,
+                tool_call_results,
+                conversation_id,
+                stream_result.collected_args,
+            )
+            assistant_tool_call_count += 1
+
+        logger.debug(
+            "Inference complete - final message history has %d assistant messages with tool_calls",
+            assistant_tool_call_count,
         )
         yield {"type": "complete", "content": final_content}
     except Exception as e:
@@ -1638,23 +1913,11 @@ async def inference_loop(
         # intended to perform end-of-response cleanup (e.g., consume guidance
         # that should only be cleared once the full response is complete).
         try:
-            enabled_tools = get_enabled_tools()
-            for t in enabled_tools:
-                cleanup_fn = t.get("cleanup_function")
-                if callable(cleanup_fn):
-                    try:
-                        if asyncio.iscoroutinefunction(cleanup_fn):
-                            await cleanup_fn()
-                        else:
-                            res = cleanup_fn()
-                            if asyncio.iscoroutine(res):
-                                await res
-                    except Exception as ce:
-                        print(
-                            f"[Ghostpad] Cleanup function error for tool {t.get('schema', {}).get('name')}: {ce}"
-                        )
+            await run_tool_cleanups(get_enabled_tools())
         except Exception as e:
-            print(f"[Ghostpad] Error running cleanup functions: {e}")
+            logger.warning("Error running cleanup functions: %s", e)
+        if client is not None:
+            await chat_service.release_openai_client(client)
 
 
 async def run_inference_to_completion(
@@ -1677,20 +1940,21 @@ async def run_inference_to_completion(
 ) -> str:
     """Run the unified inference loop to completion and return the final content (non-streaming mode)."""
     # Log all parameters for non-streaming mode as well
-    api_params = {
-        "model": model_name,
-        "temperature": temperature,
-        "top_p": top_p,
-        "max_tokens": max_tokens,
-        "frequency_penalty": frequency_penalty,
-        "presence_penalty": presence_penalty,
-        "streaming": False,
-    }
-    if seed is not None:
-        api_params["seed"] = seed
-    print(f"[OpenAI API Call - Non-streaming] Parameters: {api_params}")
+    if logger.isEnabledFor(logging.DEBUG):
+        api_params = {
+            "model": model_name,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            "frequency_penalty": frequency_penalty,
+            "presence_penalty": presence_penalty,
+            "streaming": False,
+        }
+        if seed is not None:
+            api_params["seed"] = seed
+        logger.debug("[OpenAI API Call - Non-streaming] Parameters: %s", api_params)
 
-    final_content: str = ""
+    content_parts: List[str] = []
     async for event in inference_loop(
         base_messages,
         conversation_id=conversation_id,
@@ -1711,13 +1975,14 @@ async def run_inference_to_completion(
     ):
         et = event.get("type")
         if et == "chunk":
-            final_content += event.get("content", "")
+            content_parts.append(event.get("content", ""))
         elif et == "complete":
-            final_content = event.get("content", final_content)
+            if "content" in event:
+                return event["content"]
             break
         elif et == "error":
             raise Exception(event.get("message") or "Inference error")
-    return final_content
+    return "".join(content_parts)
 
 
 # Global chat service instance
@@ -8,20 +8,41 @@ This service handles:
 - Conversation history and metadata
 """
 
-from typing import Dict, Any, List, Optional, Union
-from sqlalchemy import select, func, delete, or_
+from typing import Dict, Any, List, Optional, Set, Union
+from sqlalchemy import select, func, delete, insert, literal, null, or_, union_all
+from sqlalchemy.exc import IntegrityError
+import asyncio
 
-from .data_access_service import with_db_session
+from .data_access_service import with_db_session, with_db_readonly_session
 from models import Conversation, Message, MessageAttachment, Persona, ConversationPersona
 from .ai_service import ai_service
 from .kv_store_service import kv_store
+from .log_service import logger
+from .system_prompt_service import persona_section_cache
 
 
 class ConversationService:
     """Service for managing conversations."""
-    
-    
-    @with_db_session
+
+    def __init__(self):
+        # Fire-and-forget cleanup tasks, kept referenced until done so shutdown can await them
+        self._bg_tasks: Set[asyncio.Task] = set()
+
+    async def wait_for_background_tasks(self):
+        """Wait for pending background cleanup tasks to finish."""
+        if self._bg_tasks:
+            await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+
+    async def _bg_cleanup_kv(self, conversation_id: str):
+        """Clean up k/v store entries for a deleted conversation."""
+        try:
+            deleted_count = await kv_store.delete_keys_containing(conversation_id)
+            if deleted_count > 0:
+                logger.info("Cleaned up %d k/v entries for conversation %s", deleted_count, conversation_id)
+        except Exception:
+            logger.exception("Failed to clean up k/v entries for conversation %s", conversation_id)
+
+    @with_db_readonly_session
     async def get_all_conversations(self, session) -> List[Dict[str, Any]]:
         """Get all conversations with message counts."""
         # Get conversations with message counts
@@ -47,22 +68,23 @@ class ConversationService:
         
         return conversations
     
-    @with_db_session
+    @with_db_readonly_session
     async def get_conversation_by_id(self, conversation_id: str, session) -> Optional[Dict[str, Any]]:
         """Get a single conversation by UUID."""
-        stmt = select(Conversation).where(Conversation.id == conversation_id)
+        # Conversation and its message count in one round-trip
+        stmt = select(
+            Conversation,
+            func.count(MessageAttachment.id).label('message_count')
+        ).outerjoin(
+            MessageAttachment,
+            (MessageAttachment.entity_type == 'conversation') & 
+            (MessageAttachment.entity_id == Conversation.id)
+        ).where(Conversation.id == conversation_id).group_by(Conversation.id)
         result = await session.execute(stmt)
-        conversation = result.scalar_one_or_none()
-
-        if conversation:
-            # Get message count
-            msg_count_stmt = select(func.count(MessageAttachment.id)).where(
-                (MessageAttachment.entity_type == 'conversation') & 
-                (MessageAttachment.entity_id == conversation.id)
-            )
-            msg_count_result = await session.execute(msg_count_stmt)
-            msg_count = msg_count_result.scalar_one()
+        row = result.first()
 
+        if row:
+            conversation, msg_count = row
             return {
                 "id": conversation.id,
                 "title": conversation.title or f"Conversation {conversation.id}",
@@ -74,31 +96,41 @@ class ConversationService:
     @with_db_session
     async def create_conversation(self, title: str = None, persona_ids: List[int] = None, session=None) -> Dict[str, Any]:
         """Create a new conversation."""
-        conversation = Conversation(
-            title=title or "New Conversation"
-        )
-        session.add(conversation)
+        title = title or "New Conversation"
+        if session.bind.dialect.insert_returning:
+            # INSERT ... RETURNING fetches the generated defaults without a follow-up SELECT
+            result = await session.execute(
+                insert(Conversation)
+                .values(title=title)
+                .returning(Conversation.id, Conversation.title, Conversation.created_at)
+            )
+            conversation = result.one()
+        else:
+            conversation = Conversation(title=title)
+            session.add(conversation)
+            await session.flush()
+            await session.refresh(conversation)
         await session.commit()
-        await session.refresh(conversation)
 
         # Attach provided persona ids if present, otherwise attach default assistant persona (first persona in DB)
         try:
             if persona_ids:
-                for pid in persona_ids:
-                    try:
-                        cp = ConversationPersona(conversation_id=conversation.id, persona_id=int(pid))
-                        session.add(cp)
-                    except Exception:
-                        await session.rollback()
-                await session.commit()
+                rows = [
+                    {"conversation_id": conversation.id, "persona_id": pid}
+                    for pid in dict.fromkeys(int(pid) for pid in persona_ids)
+                ]
             else:
-                stmt = select(Persona).order_by(Persona.id.asc())
-                result = await session.execute(stmt)
-                default_persona = result.scalars().first()
-                if default_persona:
-                    cp = ConversationPersona(conversation_id=conversation.id, persona_id=default_persona.id)
-                    session.add(cp)
-                    await session.commit()
+                stmt = select(Persona.id).order_by(Persona.id.asc()).limit(1)
+                default_persona_id = (await session.execute(stmt)).scalar_one_or_none()
+                rows = (
+                    [{"conversation_id": conversation.id, "persona_id": default_persona_id}]
+                    if default_persona_id is not None
+                    else []
+                )
+            if rows:
+                await session.execute(insert(ConversationPersona), rows)
+                await session.commit()
+                persona_section_cache.invalidate(conversation.id)
         except Exception:
             # Non-fatal: continue even if persona attachment fails
             try:
@@ -113,16 +145,24 @@ class ConversationService:
             "message_count": 0
         }
     
-    @with_db_session
+    @with_db_readonly_session
     async def get_conversation_messages(self, conversation_id: str, session) -> Dict[str, Any]:
         """Get all messages in a conversation along with active personas."""
+        # Personas are loaded on their own session so both queries run concurrently
+        # (a single AsyncSession does not allow overlapping operations)
+        personas_task = asyncio.create_task(self._get_conversation_personas(conversation_id))
+
         # Messages with sequence_order
         stmt = select(Message, MessageAttachment.sequence_order).join(MessageAttachment).where(
             MessageAttachment.entity_type == 'conversation',
             MessageAttachment.entity_id == conversation_id
         ).order_by(MessageAttachment.sequence_order)
 
-        result = await session.execute(stmt)
+        try:
+            result = await session.execute(stmt)
+        except BaseException:
+            personas_task.cancel()
+            raise
         messages = []
 
         for message, sequence_order in result:
@@ -135,7 +175,13 @@ class ConversationService:
                 "sequence_order": sequence_order
             })
 
-        # Active personas for this conversation
+        personas = await personas_task
+
+        return {"messages": messages, "personas": personas}
+
+    @with_db_readonly_session
+    async def _get_conversation_personas(self, conversation_id: str, session) -> List[Dict[str, Any]]:
+        """Get the active personas for a conversation."""
         personas_stmt = select(Persona).join(ConversationPersona).where(ConversationPersona.conversation_id == conversation_id)
         personas_result = await session.execute(personas_stmt)
         personas = []
@@ -148,9 +194,57 @@ class ConversationService:
                 "created_at": p.created_at.isoformat() if p.created_at else None,
                 "updated_at": p.updated_at.isoformat() if p.updated_at else None,
             })
-
-        return {"messages": messages, "personas": personas}
+        return personas
     
+    @with_db_readonly_session
+    async def get_context_bundle(
+        self, conversation_id: str, session, limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get a conversation's messages and active personas in a single query.
+
+        Only the fields needed to build prompts are returned: role/content for
+        messages (in conversation order, the last ``limit`` when given) and
+        name/description for personas.
+        """
+        messages_stmt = select(
+            literal("message").label("kind"),
+            Message.role.label("name"),
+            Message.content.label("text"),
+            MessageAttachment.sequence_order.label("sequence_order"),
+        ).join(MessageAttachment).where(
+            MessageAttachment.entity_type == 'conversation',
+            MessageAttachment.entity_id == conversation_id
+        )
+        if limit is not None:
+            # Only the newest rows leave the database; they are put back in order below
+            recent = (
+                messages_stmt.order_by(MessageAttachment.sequence_order.desc())
+                .limit(max(limit, 0))
+                .subquery()
+            )
+            messages_stmt = select(recent)
+        personas_stmt = select(
+            literal("persona"),
+            Persona.name,
+            Persona.description,
+            null(),
+        ).join(ConversationPersona).where(ConversationPersona.conversation_id == conversation_id)
+
+        result = await session.execute(union_all(messages_stmt, personas_stmt))
+
+        messages = []
+        personas = []
+        for kind, name, text, sequence_order in result:
+            if kind == "message":
+                messages.append((sequence_order, {"role": name, "content": text}))
+            else:
+                personas.append({"name": name, "description": text})
+
+        # UNION ALL gives no ordering guarantee across branches
+        messages.sort(key=lambda item: item[0])
+
+        return {"messages": [message for _, message in messages], "personas": personas}
+
     @with_db_session
     async def delete_conversation(self, conversation_id: str, session) -> Dict[str, Any]:
         """Delete a conversation and all its message attachments."""
@@ -172,32 +266,29 @@ class ConversationService:
         # Delete the conversation (cascade will handle message attachments)
         await session.delete(conversation)
         await session.commit()
+        persona_section_cache.invalidate(conversation_id)
         
-        # Clean up k/v store entries for this conversation
-        try:
-            deleted_count = await kv_store.delete_keys_containing(conversation_id)
-            if deleted_count > 0:
-                print(f"Cleaned up {deleted_count} k/v entries for conversation {conversation_id}")
-        except Exception as e:
-            print(f"Warning: Failed to clean up k/v entries for conversation {conversation_id}: {e}")
+        # Clean up k/v store entries for this conversation without holding up the response
+        task = asyncio.create_task(self._bg_cleanup_kv(conversation_id))
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
 
         return {"message": "Conversation deleted successfully"}
     
     @with_db_session
     async def add_persona_to_conversation(self, conversation_id: str, persona_id: int, session) -> Dict[str, Any]:
         """Attach a persona to a conversation."""
-        # Check conversation exists
-        stmt = select(Conversation).where(Conversation.id == conversation_id)
+        # Check conversation and persona exist in a single EXISTS probe
+        # (SQLite does not enforce the foreign keys for us)
+        stmt = select(
+            select(Conversation.id).where(Conversation.id == conversation_id).exists(),
+            select(Persona.id).where(Persona.id == persona_id).exists(),
+        )
         result = await session.execute(stmt)
-        conversation = result.scalar_one_or_none()
-        if not conversation:
+        conversation_exists, persona_exists = result.one()
+        if not conversation_exists:
             raise ValueError("Conversation not found")
-
-        # Check persona exists
-        stmt = select(Persona).where(Persona.id == persona_id)
-        result = await session.execute(stmt)
-        persona = result.scalar_one_or_none()
-        if not persona:
+        if not persona_exists:
             raise ValueError("Persona not found")
 
         # Create junction if not exists
@@ -205,8 +296,9 @@ class ConversationService:
             cp = ConversationPersona(conversation_id=conversation_id, persona_id=persona_id)
             session.add(cp)
             await session.commit()
-        except Exception:
-            # Could be unique constraint violation — ignore
+            persona_section_cache.invalidate(conversation_id)
+        except IntegrityError:
+            # Already attached (unique constraint) — ignore
             await session.rollback()
 
         return {"message": "Persona added to conversation"}
@@ -214,17 +306,17 @@ class ConversationService:
     @with_db_session
     async def remove_persona_from_conversation(self, conversation_id: str, persona_id: int, session) -> Dict[str, Any]:
         """Remove a persona from a conversation."""
-        stmt = select(ConversationPersona).where(
+        stmt = delete(ConversationPersona).where(
             ConversationPersona.conversation_id == conversation_id,
             ConversationPersona.persona_id == persona_id
         )
         result = await session.execute(stmt)
-        cp = result.scalar_one_or_none()
-        if not cp:
+        if result.rowcount == 0:
+            await session.rollback()
             raise ValueError("Persona not attached to conversation")
 
-        await session.delete(cp)
         await session.commit()
+        persona_section_cache.invalidate(conversation_id)
 
         return {"message": "Persona removed from conversation"}
     
@@ -8,15 +8,25 @@ This service handles:
 - Session context management for other services
 """
 
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from sqlalchemy.orm import Session, sessionmaker
+from typing import AsyncGenerator, Optional, Tuple
+import asyncio
+import contextvars
 import functools
+import inspect
 
 from models import Base, Persona
 from utils.constants import ERROR_DATA_ACCESS_NOT_INITIALIZED
 
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///conversations.db"
+
+# Session opened by the innermost decorated call in the current task, if any
+_current_session: contextvars.ContextVar[Optional[Tuple[asyncio.Task, AsyncSession]]] = (
+    contextvars.ContextVar("ghostpad_db_session", default=None)
+)
+
 
 class DataAccessService:
     """Singleton service for database access operations."""
@@ -26,17 +36,35 @@ class DataAccessService:
         self._session_factory = None
         self._initialized = False
 
-    async def initialize(self):
-        """Initialize the database engine and session factory."""
+    async def initialize(self, database_url: str = DEFAULT_DATABASE_URL):
+        """Initialize the database engine and session factory.
+
+        Args:
+            database_url: SQLAlchemy async URL. SQLite (aiosqlite) is the default;
+                postgresql+asyncpg URLs are supported when asyncpg is installed.
+        """
         if self._initialized:
             return
 
         # Create async engine
-        self._engine = create_async_engine("sqlite+aiosqlite:///conversations.db")
+        if database_url.startswith("sqlite"):
+            self._engine = create_async_engine(
+                database_url,
+                pool_pre_ping=True,
+            )
+            event.listen(self._engine.sync_engine, "connect", _set_sqlite_pragmas)
+        else:
+            self._engine = create_async_engine(
+                database_url,
+                pool_size=10,
+                max_overflow=20,
+                pool_pre_ping=True,
+            )
 
         # Create tables
         async with self._engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(_create_missing_indexes)
 
         # Create session factory
         self._session_factory = sessionmaker(
@@ -67,11 +95,17 @@ class DataAccessService:
             # Non-fatal: if seeding fails, continue without blocking startup
             pass
 
-    def get_session_context(self):
-        """Get a database session context manager for use in services."""
+    def get_session_context(self, readonly: bool = False, share: bool = False):
+        """Get a database session context manager for use in services.
+
+        Args:
+            readonly: The caller only reads, so an enclosing session may be reused.
+            share: Reuse an enclosing session from the same task (read-only callers
+                only), or publish this one to nested calls.
+        """
         if not self._initialized:
             raise RuntimeError(ERROR_DATA_ACCESS_NOT_INITIALIZED)
-        return DatabaseSessionContext(self._session_factory)
+        return DatabaseSessionContext(self._session_factory, readonly=readonly, share=share)
 
     async def get_session_for_fastapi(self) -> AsyncGenerator[AsyncSession, None]:
         """Database session dependency for FastAPI routes."""
@@ -98,34 +132,85 @@ class DataAccessService:
 
 
 class DatabaseSessionContext:
-    """Async context manager for database sessions."""
+    """Async context manager for database sessions.
 
-    def __init__(self, session_factory):
+    With share=True, a read-only caller reuses a session already opened further up
+    the same task instead of opening a second one. Writers always get their own
+    session, so their commit() or rollback() never ends the caller's transaction.
+    Sessions are never shared across tasks, since an AsyncSession does not allow
+    concurrent operations.
+    """
+
+    def __init__(self, session_factory, readonly: bool = False, share: bool = False):
         self.session_factory = session_factory
+        self.readonly = readonly
+        self.share = share
         self.session = None
+        self._owned = True
+        self._token = None
 
     async def __aenter__(self):
+        if self.share and self.readonly:
+            held = _current_session.get()
+            if held is not None:
+                task, session = held
+                if task is asyncio.current_task():
+                    self.session = session
+                    self._owned = False
+                    return session
+
         self.session = self.session_factory()
+        if self.readonly:
+            _mark_readonly(self.session)
+        if self.share:
+            self._token = _current_session.set((asyncio.current_task(), self.session))
         return self.session
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if not self._owned:
+            return
+        if self._token is not None:
+            _current_session.reset(self._token)
+            self._token = None
         if self.session:
             await self.session.close()
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure each new SQLite connection for concurrent reads and cheaper commits."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-64000")
+    finally:
+        cursor.close()
+
+
+def _create_missing_indexes(sync_conn):
+    """Create indexes added to models after their tables already existed.
+
+    create_all only emits indexes together with new tables.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 # Global singleton instance
 data_access_service = DataAccessService()
 
 
-def with_db_session(func):
-    """Decorator that provides a database session to the decorated method."""
-    import inspect
-
+def _make_session_wrapper(func, get_session_context, readonly: bool = False):
+    """Build the session-injecting wrapper for a decorated method."""
     if inspect.isasyncgenfunction(func):
-        # Handle async generators
+        # Handle async generators. They suspend between items, so they always get
+        # a session of their own rather than sharing one through the task context.
         @functools.wraps(func)
         async def async_gen_wrapper(*args, **kwargs):
-            async with data_access_service.get_session_context() as session:
+            async with get_session_context(readonly=readonly) as session:
                 async for item in func(*args, session=session, **kwargs):
                     yield item
 
@@ -134,7 +219,36 @@ def with_db_session(func):
         # Handle regular async functions
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            async with data_access_service.get_session_context() as session:
+            async with get_session_context(readonly=readonly, share=True) as session:
                 return await func(*args, session=session, **kwargs)
 
         return wrapper
+
+
+def _mark_readonly(session):
+    """Flag a session as read-only and skip autoflush before its queries."""
+    session.sync_session.info["readonly"] = True
+    session.sync_session.autoflush = False
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_readonly_flush(session, flush_context, instances):
+    """Guard against writes through sessions handed out by with_db_readonly_session."""
+    if session.info.get("readonly") and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Attempted to write through a read-only database session")
+
+
+def with_db_session(func):
+    """Decorator that provides a database session to the decorated method."""
+    return _make_session_wrapper(func, data_access_service.get_session_context)
+
+
+def with_db_readonly_session(func):
+    """Decorator that provides a read-only database session to the decorated method.
+
+    For methods that only query: autoflush is disabled and any attempt to flush
+    changes raises.
+    """
+    return _make_session_wrapper(
+        func, data_access_service.get_session_context, readonly=True
+    )
@@ -1,10 +1,69 @@
+from collections import OrderedDict
 from contextlib import asynccontextmanager
-import json
+import asyncio
 import os
-from typing import Any, List, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import aiosqlite
 
+from utils.json_utils import dumps, loads
+
+# SQL condition that holds when the row's value is a JSON array (CASE keeps
+# json_type from raising on values that are not valid JSON)
+_IS_ARRAY = "CASE WHEN json_valid(value) THEN json_type(value) END = 'array'"
+# The row's list in minified JSON, or an empty list if the value is not a list
+_LIST_BASE = f"(CASE WHEN {_IS_ARRAY} THEN json(value) ELSE '[]' END)"
+
+# Cache marker for keys known to be absent
+_MISSING = object()
+
+
+class _ReadWriteLock:
+    """Lets reads share the connection while keeping them out of open write transactions.
+
+    Waiting writers block new readers so a steady stream of reads can't starve them.
+    Releasing never awaits, so a cancelled holder always gives the lock back.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        # Wake everyone waiting on the current event; later waiters get a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    @asynccontextmanager
+    async def shared(self):
+        while self._writer or self._writers_waiting:
+            await self._changed.wait()
+        self._readers += 1
+        try:
+            yield
+        finally:
+            self._readers -= 1
+            if not self._readers:
+                self._notify()
+
+    @asynccontextmanager
+    async def exclusive(self):
+        self._writers_waiting += 1
+        try:
+            while self._writer or self._readers:
+                await self._changed.wait()
+        finally:
+            self._writers_waiting -= 1
+            self._notify()
+        self._writer = True
+        try:
+            yield
+        finally:
+            self._writer = False
+            self._notify()
+
 
 class KVStoreService:
     """
@@ -17,10 +76,29 @@ class KVStoreService:
         self.db_path = db_path
         # Ensure directory exists
         os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # One long-lived connection shared by all operations, opened on first use
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_lock = asyncio.Lock()
+        # Writes take it exclusively and reads shared, so a read never sees (or caches)
+        # rows from a write transaction that is still open on the shared connection
+        self._rw_lock = _ReadWriteLock()
+        # LRU of key -> stored JSON text (or _MISSING), kept in step with writes made
+        # through this service. Raw text is cached so callers never share mutable values.
+        self._cache: OrderedDict[str, Any] = OrderedDict()
+        self._cache_max = 1024
+        # Bumped on every write so a read that raced a write doesn't cache stale data
+        self._cache_generation = 0
+        # data_version the cache was last validated against; it moves when another
+        # connection (e.g. an external DB client) commits
+        self._cache_data_version: Optional[int] = None
+        # Keys written through this service, fed to the KV watcher while it listens
+        self._change_queue: Optional[asyncio.Queue] = None
+        # Called with each written key, or None when any key may have changed
+        self._write_listeners: List[Callable[[Optional[str]], None]] = []
 
     async def init_db(self):
         """Initialize the database schema"""
-        async with self._get_connection() as conn:
+        async with self._get_write_connection() as conn:
             await conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS kv_store (
@@ -34,33 +112,161 @@ class KVStoreService:
             )
             await conn.commit()
 
+    async def _conn_get(self) -> aiosqlite.Connection:
+        """Get the shared connection, opening it on first use"""
+        if self._conn is None:
+            async with self._conn_lock:
+                if self._conn is None:
+                    conn = await aiosqlite.connect(self.db_path)
+                    await self._apply_pragmas(conn)
+                    # A new connection counts data_version afresh and may have missed
+                    # external writes, so start the cache over from this point
+                    self._cache_data_version = await self._read_data_version(conn)
+                    self._invalidate()
+                    self._conn = conn
+        return self._conn
+
+    async def _apply_pragmas(self, conn: aiosqlite.Connection) -> None:
+        """Tune a new connection: WAL with NORMAL sync avoids an fsync per commit
+        and lets readers run alongside the writer"""
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute("PRAGMA busy_timeout=5000")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        await conn.execute("PRAGMA cache_size=-20000")
+        await conn.execute("PRAGMA mmap_size=134217728")
+
     @asynccontextmanager
     async def _get_connection(self):
-        """Async context manager for database connections"""
-        conn = await aiosqlite.connect(self.db_path)
-        try:
+        """Async context manager yielding the shared connection for reads"""
+        async with self._rw_lock.shared():
+            yield await self._conn_get()
+
+    @asynccontextmanager
+    async def _get_write_connection(self):
+        """Async context manager yielding the shared connection for a write transaction"""
+        async with self._rw_lock.exclusive():
+            conn = await self._conn_get()
+            try:
+                yield conn
+            except BaseException:
+                # Never leave a half-done transaction open on the shared connection
+                if conn.in_transaction:
+                    await conn.rollback()
+                raise
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """Run a read-modify-write as one IMMEDIATE transaction with a single commit"""
+        async with self._get_write_connection() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
             yield conn
-        finally:
-            await conn.close()
+            await conn.commit()
+
+    async def external_change_marker(self) -> int:
+        """SQLite's data_version: changes only when another connection commits"""
+        async with self._get_connection() as conn:
+            return await self._read_data_version(conn)
+
+    async def _read_data_version(self, conn: aiosqlite.Connection) -> int:
+        """Read data_version on a given connection"""
+        cursor = await conn.execute("PRAGMA data_version")
+        row = await cursor.fetchone()
+        return row[0]
+
+    async def check_external_changes(self) -> None:
+        """Drop cached values if another connection committed since the last check"""
+        marker = await self.external_change_marker()
+        if marker != self._cache_data_version:
+            self._cache_data_version = marker
+            self._invalidate()
+
+    def subscribe_changes(self) -> asyncio.Queue:
+        """Start feeding the keys of values set or updated through this service into a queue"""
+        if self._change_queue is None:
+            self._change_queue = asyncio.Queue()
+        return self._change_queue
+
+    def unsubscribe_changes(self) -> None:
+        """Stop feeding the change queue"""
+        self._change_queue = None
+
+    def add_write_listener(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Call listener with each key whose value changes, or None when any key may have"""
+        self._write_listeners.append(listener)
+
+    def _notify_written(self, *keys: Optional[str]) -> None:
+        """Tell write listeners about changed keys"""
+        for listener in self._write_listeners:
+            for key in keys:
+                listener(key)
+
+    def _notify_change(self, *keys: str) -> None:
+        """Report keys whose values were written"""
+        queue = self._change_queue
+        if queue is not None:
+            for key in keys:
+                queue.put_nowait(key)
+
+    async def reconnect(self) -> None:
+        """Drop the shared connection after it failed; the next operation reopens it.
+
+        Waits for in-flight reads and writes so none has the connection closed under it.
+        """
+        async with self._rw_lock.exclusive(), self._conn_lock:
+            conn, self._conn = self._conn, None
+            if conn is not None:
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+
+    async def close(self) -> None:
+        """Close the shared connection once in-flight operations finish"""
+        async with self._rw_lock.exclusive(), self._conn_lock:
+            if self._conn is not None:
+                await self._conn.close()
+                self._conn = None
 
     def _serialize(self, value: Any) -> tuple[str, str]:
         """Serialize Python objects to JSON string and return type info"""
         data_type = type(value).__name__
-        json_value = json.dumps(value)
+        json_value = dumps(value)
         return json_value, data_type
 
+    def _cache_put(self, key: str, json_value: Any) -> None:
+        """Store a key's JSON text (or _MISSING) in the LRU"""
+        cache = self._cache
+        cache[key] = json_value
+        cache.move_to_end(key)
+        if len(cache) > self._cache_max:
+            cache.popitem(last=False)
+
+    def _invalidate(self, key: Optional[str] = None) -> None:
+        """Drop a key (or everything) from the LRU after a write"""
+        self._cache_generation += 1
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+        self._notify_written(key)
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Forget cached values for a key (or everything) written by another connection"""
+        self._invalidate(key)
+
     def _deserialize(self, json_value: str) -> Any:
         """Deserialize JSON string back to Python objects"""
         try:
-            return json.loads(json_value)
-        except (json.JSONDecodeError, TypeError):
+            return loads(json_value)
+        except (ValueError, TypeError):
             return json_value
 
     # String operations
     async def set(self, key: str, value: Union[str, int, float]) -> None:
         """Set a string value"""
         json_value, data_type = self._serialize(value)
-        async with self._get_connection() as conn:
+        async with self._get_write_connection() as conn:
             await conn.execute(
                 """
                 INSERT OR REPLACE INTO kv_store (key, value, data_type, updated_at)
@@ -69,24 +275,129 @@ class KVStoreService:
                 (key, json_value, data_type),
             )
             await conn.commit()
+            self._invalidate(key)
+            self._cache_put(key, json_value)
+        self._notify_change(key)
+
+    async def set_many(self, items: Dict[str, Any]) -> None:
+        """Set several values in a single transaction"""
+        if not items:
+            return
+        rows = [(key, *self._serialize(value)) for key, value in items.items()]
+        async with self._get_write_connection() as conn:
+            await conn.executemany(
+                """
+                INSERT OR REPLACE INTO kv_store (key, value, data_type, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """,
+                rows,
+            )
+            await conn.commit()
+            self._cache_generation += 1
+            for key, json_value, _ in rows:
+                self._cache_put(key, json_value)
+        self._notify_written(*items)
+        self._notify_change(*items)
 
     async def get(self, key: str, default: Any = None) -> Any:
         """Get a string value"""
+        if key in self._cache:
+            await self.check_external_changes()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return default if cached is _MISSING else self._deserialize(cached)
+
+        generation = self._cache_generation
         async with self._get_connection() as conn:
             cursor = await conn.execute(
-                "SELECT value, data_type FROM kv_store WHERE key = ?", (key,)
+                "SELECT value FROM kv_store WHERE key = ?", (key,)
             )
             row = await cursor.fetchone()
-            if row:
-                json_value, _ = row
-                return self._deserialize(json_value)
-            return default
+        json_value = row[0] if row else _MISSING
+        if generation == self._cache_generation:
+            self._cache_put(key, json_value)
+        return default if json_value is _MISSING else self._deserialize(json_value)
+
+    async def get_and_set(self, key: str, value: Any, default: Any = None) -> Any:
+        """Set a value and return the previous one (``default`` if unset) in one transaction.
+
+        Writing the value a key already holds is skipped, so it doesn't count as a change.
+        """
+        json_value, data_type = self._serialize(value)
+        async with self._transaction() as conn:
+            cursor = await conn.execute(
+                "SELECT value FROM kv_store WHERE key = ?", (key,)
+            )
+            row = await cursor.fetchone()
+            changed = row is None or row[0] != json_value
+            if changed:
+                await conn.execute(
+                    """
+                    INSERT OR REPLACE INTO kv_store (key, value, data_type, updated_at)
+                    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                """,
+                    (key, json_value, data_type),
+                )
+        if changed:
+            self._invalidate(key)
+            self._cache_put(key, json_value)
+            self._notify_change(key)
+        return default if row is None else self._deserialize(row[0])
+
+    async def get_many(
+        self, keys: List[str], defaults: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Get several values, serving cached keys and fetching the rest in one query.
+
+        Missing keys take their value from ``defaults`` when given, otherwise they
+        are left out of the result.
+        """
+        values: Dict[str, Any] = {}
+        misses: List[str] = []
+        cache = self._cache
+        if any(key in cache for key in keys):
+            await self.check_external_changes()
+        for key in keys:
+            cached = cache.get(key)
+            if cached is None:
+                misses.append(key)
+            else:
+                cache.move_to_end(key)
+                if cached is not _MISSING:
+                    values[key] = self._deserialize(cached)
+
+        if misses:
+            generation = self._cache_generation
+            found: Dict[str, str] = {}
+            async with self._get_connection() as conn:
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(misses), 500):
+                    batch = misses[start : start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    cursor = await conn.execute(
+                        f"SELECT key, value FROM kv_store WHERE key IN ({placeholders})", batch
+                    )
+                    found.update(await cursor.fetchall())
+            cache_results = generation == self._cache_generation
+            for key in misses:
+                json_value = found.get(key, _MISSING)
+                if cache_results:
+                    self._cache_put(key, json_value)
+                if json_value is not _MISSING:
+                    values[key] = self._deserialize(json_value)
+
+        if defaults:
+            for key, default in defaults.items():
+                values.setdefault(key, default)
+        return values
 
     async def delete(self, key: str) -> bool:
         """Delete a key"""
-        async with self._get_connection() as conn:
+        async with self._get_write_connection() as conn:
             cursor = await conn.execute("DELETE FROM kv_store WHERE key = ?", (key,))
             await conn.commit()
+            self._invalidate(key)
             return cursor.rowcount > 0
 
     async def exists(self, key: str) -> bool:
@@ -96,54 +407,96 @@ class KVStoreService:
             return await cursor.fetchone() is not None
 
     # List operations
+    # Lists are mutated in SQL so a push/pop never round-trips the whole list through Python
+    async def _push(self, key: str, values: tuple, new_value_sql: str) -> int:
+        """Push serialized values onto a list, resetting non-list values to an empty list"""
+        # JSON text of the pushed items without the surrounding brackets
+        items_json = self._serialize(list(values))[0][1:-1]
+        async with self._transaction() as conn:
+            await conn.execute(
+                "INSERT OR IGNORE INTO kv_store (key, value, data_type) VALUES (?, '[]', 'list')",
+                (key,),
+            )
+            await conn.execute(
+                f"""
+                UPDATE kv_store
+                SET value = {new_value_sql.format(base=_LIST_BASE)}, data_type = 'list',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE key = :key
+            """,
+                {"key": key, "items": items_json},
+            )
+            cursor = await conn.execute(
+                "SELECT json_array_length(value) FROM kv_store WHERE key = ?", (key,)
+            )
+            row = await cursor.fetchone()
+        self._invalidate(key)
+        self._notify_change(key)
+        return row[0]
+
     async def lpush(self, key: str, *values) -> int:
         """Push values to the left of a list"""
-        current = await self.get(key, [])
-        if not isinstance(current, list):
-            current = []
-
-        for value in reversed(values):
-            current.insert(0, value)
-
-        await self.set(key, current)
-        return len(current)
+        if not values:
+            return await self.llen(key)
+        return await self._push(
+            key,
+            values,
+            "'[' || :items || CASE WHEN {base} = '[]' THEN ']' ELSE ',' || substr({base}, 2) END",
+        )
 
     async def rpush(self, key: str, *values) -> int:
         """Push values to the right of a list"""
-        current = await self.get(key, [])
-        if not isinstance(current, list):
-            current = []
+        if not values:
+            return await self.llen(key)
+        return await self._push(
+            key,
+            values,
+            "CASE WHEN {base} = '[]' THEN '[' "
+            "ELSE substr({base}, 1, length({base}) - 1) || ',' END || :items || ']'",
+        )
 
-        current.extend(values)
-        await self.set(key, current)
-        return len(current)
+    async def _pop(self, key: str, path: str) -> Any:
+        """Remove and return the list element at a JSON path"""
+        async with self._transaction() as conn:
+            cursor = await conn.execute(
+                f"""
+                SELECT value -> :path FROM kv_store
+                WHERE key = :key AND {_IS_ARRAY} AND json_array_length(value) > 0
+            """,
+                {"key": key, "path": path},
+            )
+            row = await cursor.fetchone()
+            if row:
+                await conn.execute(
+                    """
+                    UPDATE kv_store SET value = json_remove(value, ?), updated_at = CURRENT_TIMESTAMP
+                    WHERE key = ?
+                """,
+                    (path, key),
+                )
+        if not row:
+            return None
+        self._invalidate(key)
+        self._notify_change(key)
+        return self._deserialize(row[0])
 
     async def lpop(self, key: str) -> Any:
         """Pop value from the left of a list"""
-        current = await self.get(key, [])
-        if not isinstance(current, list) or not current:
-            return None
-
-        value = current.pop(0)
-        await self.set(key, current)
-        return value
+        return await self._pop(key, "$[0]")
 
     async def rpop(self, key: str) -> Any:
         """Pop value from the right of a list"""
-        current = await self.get(key, [])
-        if not isinstance(current, list) or not current:
-            return None
-
-        value = current.pop()
-        await self.set(key, current)
-        return value
+        return await self._pop(key, "$[#-1]")
 
     async def llen(self, key: str) -> int:
         """Get length of a list"""
-        current = await self.get(key, [])
-        if not isinstance(current, list):
-            return 0
-        return len(current)
+        async with self._get_connection() as conn:
+            cursor = await conn.execute(
+                f"SELECT json_array_length(value) FROM kv_store WHERE key = ? AND {_IS_ARRAY}",
+                (key,),
+            )
+            row = await cursor.fetchone()
+            return row[0] if row else 0
 
     async def lrange(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
         """Get a range of elements from a list"""
@@ -157,13 +510,21 @@ class KVStoreService:
 
     async def lremove_at(self, key: str, index: int) -> bool:
         """Remove item at specific index from a list"""
-        current = await self.get(key, [])
-        if not isinstance(current, list) or index >= len(current) or index < 0:
+        if index < 0:
             return False
-
-        current.pop(index)
-        await self.set(key, current)
-        return True
+        async with self._transaction() as conn:
+            cursor = await conn.execute(
+                f"""
+                UPDATE kv_store SET value = json_remove(value, :path), updated_at = CURRENT_TIMESTAMP
+                WHERE key = :key AND {_IS_ARRAY} AND :index < json_array_length(value)
+            """,
+                {"key": key, "path": f"$[{index}]", "index": index},
+            )
+        self._invalidate(key)
+        if cursor.rowcount > 0:
+            self._notify_change(key)
+            return True
+        return False
 
     # Utility methods
     async def keys(self) -> List[str]:
@@ -173,20 +534,32 @@ class KVStoreService:
             rows = await cursor.fetchall()
             return [row[0] for row in rows]
 
+    async def scan_updated_at(self) -> List[tuple[str, str]]:
+        """Get every key with its updated_at timestamp"""
+        async with self._get_connection() as conn:
+            cursor = await conn.execute("SELECT key, updated_at FROM kv_store")
+            return await cursor.fetchall()
+
     async def clear(self) -> None:
         """Clear all data"""
-        async with self._get_connection() as conn:
+        async with self._get_write_connection() as conn:
             await conn.execute("DELETE FROM kv_store")
             await conn.commit()
+            self._invalidate()
 
     async def delete_keys_containing(self, pattern: str) -> int:
         """Delete all keys that contain the given pattern"""
-        async with self._get_connection() as conn:
+        async with self._get_write_connection() as conn:
             cursor = await conn.execute(
-                "DELETE FROM kv_store WHERE key LIKE ?", (f"%{pattern}%",)
+                "DELETE FROM kv_store WHERE key LIKE ? RETURNING key", (f"%{pattern}%",)
             )
+            deleted = [row[0] for row in await cursor.fetchall()]
             await conn.commit()
-            return cursor.rowcount
+            self._cache_generation += 1
+            for cached_key in [k for k in self._cache if pattern in k]:
+                del self._cache[cached_key]
+        self._notify_written(*deleted)
+        return len(deleted)
 
 
 kv_store = KVStoreService("data.db")
@@ -7,13 +7,41 @@ This service handles:
 - Content management
 """
 
+from datetime import datetime
 from typing import Dict, Any, List, Optional
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 
 from models import LibrarySnippet
 from services.data_access_service import with_db_session
 
 
+# Columns needed for API responses; list endpoints select these as plain rows
+# instead of hydrating ORM objects
+_SNIPPET_COLUMNS = (
+    LibrarySnippet.id,
+    LibrarySnippet.type,
+    LibrarySnippet.name,
+    LibrarySnippet.content,
+    LibrarySnippet.created_at,
+    LibrarySnippet.updated_at,
+)
+
+# Statement reused across calls; the id is bound at execute time
+_GET_SNIPPET = select(LibrarySnippet).where(LibrarySnippet.id == bindparam("snippet_id"))
+
+
+def _snippet_to_dict(s, _iso=datetime.isoformat) -> Dict[str, Any]:
+    """Serialize a library snippet (ORM object or row with the same columns) for API responses."""
+    return {
+        "id": s.id,
+        "type": s.type,
+        "name": s.name,
+        "content": s.content,
+        "created_at": _iso(s.created_at) if s.created_at else None,
+        "updated_at": _iso(s.updated_at) if s.updated_at else None,
+    }
+
+
 class LibraryService:
     """Service for managing library snippets."""
 
@@ -22,44 +50,24 @@ class LibraryService:
         self, session, snippet_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """List all library snippets, optionally filtered by type."""
-        stmt = select(LibrarySnippet)
+        stmt = select(*_SNIPPET_COLUMNS)
         if snippet_type:
             stmt = stmt.where(LibrarySnippet.type == snippet_type)
         stmt = stmt.order_by(LibrarySnippet.updated_at.desc())
 
         result = await session.execute(stmt)
-        snippets = []
-        for s in result.scalars():
-            snippets.append(
-                {
-                    "id": s.id,
-                    "type": s.type,
-                    "name": s.name,
-                    "content": s.content,
-                    "created_at": s.created_at.isoformat() if s.created_at else None,
-                    "updated_at": s.updated_at.isoformat() if s.updated_at else None,
-                }
-            )
-        return snippets
+        return [_snippet_to_dict(row) for row in result.all()]
 
     @with_db_session
     async def get_snippet(self, snippet_id: int, session) -> Dict[str, Any]:
         """Get a single library snippet by ID."""
-        stmt = select(LibrarySnippet).where(LibrarySnippet.id == snippet_id)
-        result = await session.execute(stmt)
+        result = await session.execute(_GET_SNIPPET, {"snippet_id": snippet_id})
         s = result.scalar_one_or_none()
 
         if not s:
             raise ValueError("Snippet not found")
 
-        return {
-            "id": s.id,
-            "type": s.type,
-            "name": s.name,
-            "content": s.content,
-            "created_at": s.created_at.isoformat() if s.created_at else None,
-            "updated_at": s.updated_at.isoformat() if s.updated_at else None,
-        }
+        return _snippet_to_dict(s)
 
     @with_db_session
     async def create_snippet(
@@ -74,24 +82,12 @@ class LibraryService:
         await session.commit()
         await session.refresh(snippet)
 
-        return {
-            "id": snippet.id,
-            "type": snippet.type,
-            "name": snippet.name,
-            "content": snippet.content,
-            "created_at": (
-                snippet.created_at.isoformat() if snippet.created_at else None
-            ),
-            "updated_at": (
-                snippet.updated_at.isoformat() if snippet.updated_at else None
-            ),
-        }
+        return _snippet_to_dict(snippet)
 
     @with_db_session
     async def delete_snippet(self, snippet_id: int, session) -> Dict[str, Any]:
         """Delete a library snippet."""
-        stmt = select(LibrarySnippet).where(LibrarySnippet.id == snippet_id)
-        result = await session.execute(stmt)
+        result = await session.execute(_GET_SNIPPET, {"snippet_id": snippet_id})
         s = result.scalar_one_or_none()
 
         if not s:
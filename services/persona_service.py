@@ -7,64 +7,79 @@ This service handles:
 - Persona validation and management
 """
 
+from datetime import datetime
 from typing import Dict, Any, List, Optional
-from sqlalchemy import select, delete
+from sqlalchemy import bindparam, delete, func, select
 
 from utils.constants import ERROR_PERSONA_NOT_FOUND
 
 from .data_access_service import with_db_session
+from .system_prompt_service import persona_section_cache
 from models import Persona, Conversation, ConversationPersona, MessageAttachment
 
 
+# Columns needed for API responses; list endpoints select these as plain rows
+# instead of hydrating ORM objects
+_PERSONA_COLUMNS = (
+    Persona.id,
+    Persona.name,
+    Persona.description,
+    Persona.avatar_url,
+    Persona.created_at,
+    Persona.updated_at,
+)
+
+# Statements reused across calls; parameters are bound at execute time
+_GET_PERSONA = select(Persona).where(Persona.id == bindparam("persona_id"))
+_PERSONA_ID_BY_NAME = select(Persona.id).where(Persona.name == bindparam("name")).limit(1)
+_PERSONA_ID_BY_NAME_EXCLUDING = (
+    select(Persona.id)
+    .where(Persona.name == bindparam("name"), Persona.id != bindparam("exclude_id"))
+    .limit(1)
+)
+_PERSONA_NAMES_FOR_CONVERSATION = (
+    select(Persona.name)
+    .join(ConversationPersona)
+    .where(ConversationPersona.conversation_id == bindparam("conversation_id"))
+)
+
+
+def _persona_to_dict(persona, _iso=datetime.isoformat) -> Dict[str, Any]:
+    """Serialize a persona for API responses.
+
+    Takes an ORM object or a _PERSONA_COLUMNS row, which exposes the same attributes,
+    so list and single-persona endpoints share one field list.
+    """
+    return {
+        "id": persona.id,
+        "name": persona.name,
+        "description": persona.description,
+        "avatar_url": persona.avatar_url,
+        "created_at": _iso(persona.created_at) if persona.created_at else None,
+        "updated_at": _iso(persona.updated_at) if persona.updated_at else None,
+    }
+
+
 class PersonaService:
     """Service for managing AI personas."""
 
     @with_db_session
     async def list_personas(self, session) -> List[Dict[str, Any]]:
         """List all personas."""
-        stmt = select(Persona).order_by(Persona.updated_at.desc())
+        stmt = select(*_PERSONA_COLUMNS).order_by(Persona.updated_at.desc())
         result = await session.execute(stmt)
-        personas = []
-        for persona in result.scalars():
-            personas.append(
-                {
-                    "id": persona.id,
-                    "name": persona.name,
-                    "description": persona.description,
-                    "avatar_url": persona.avatar_url,
-                    "created_at": (
-                        persona.created_at.isoformat() if persona.created_at else None
-                    ),
-                    "updated_at": (
-                        persona.updated_at.isoformat() if persona.updated_at else None
-                    ),
-                }
-            )
-
-        return personas
+        return [_persona_to_dict(row) for row in result.all()]
 
     @with_db_session
     async def get_persona(self, persona_id: int, session) -> Dict[str, Any]:
         """Get a single persona."""
-        stmt = select(Persona).where(Persona.id == persona_id)
-        result = await session.execute(stmt)
+        result = await session.execute(_GET_PERSONA, {"persona_id": persona_id})
         persona = result.scalar_one_or_none()
 
         if not persona:
             raise ValueError(ERROR_PERSONA_NOT_FOUND)
 
-        return {
-            "id": persona.id,
-            "name": persona.name,
-            "description": persona.description,
-            "avatar_url": persona.avatar_url,
-            "created_at": (
-                persona.created_at.isoformat() if persona.created_at else None
-            ),
-            "updated_at": (
-                persona.updated_at.isoformat() if persona.updated_at else None
-            ),
-        }
+        return _persona_to_dict(persona)
 
     @with_db_session
     async def create_persona(
@@ -84,18 +99,7 @@ class PersonaService:
         await session.commit()
         await session.refresh(persona)
 
-        return {
-            "id": persona.id,
-            "name": persona.name,
-            "description": persona.description,
-            "avatar_url": persona.avatar_url,
-            "created_at": (
-                persona.created_at.isoformat() if persona.created_at else None
-            ),
-            "updated_at": (
-                persona.updated_at.isoformat() if persona.updated_at else None
-            ),
-        }
+        return _persona_to_dict(persona)
 
     @with_db_session
     async def update_persona(
@@ -107,8 +111,7 @@ class PersonaService:
         avatar_url: str = None,
     ) -> Dict[str, Any]:
         """Update an existing persona."""
-        stmt = select(Persona).where(Persona.id == persona_id)
-        result = await session.execute(stmt)
+        result = await session.execute(_GET_PERSONA, {"persona_id": persona_id})
         persona = result.scalar_one_or_none()
 
         if not persona:
@@ -123,28 +126,18 @@ class PersonaService:
             persona.avatar_url = avatar_url
 
         await session.commit()
+        # Name and description are rendered into every conversation's persona section
+        persona_section_cache.invalidate()
         await session.refresh(persona)
 
-        return {
-            "id": persona.id,
-            "name": persona.name,
-            "description": persona.description,
-            "avatar_url": persona.avatar_url,
-            "created_at": (
-                persona.created_at.isoformat() if persona.created_at else None
-            ),
-            "updated_at": (
-                persona.updated_at.isoformat() if persona.updated_at else None
-            ),
-        }
+        return _persona_to_dict(persona)
 
     @with_db_session
     async def delete_persona(
         self, persona_id: int, session, delete_conversations: bool = False
     ) -> Dict[str, Any]:
         """Delete a persona and optionally its associated conversations."""
-        stmt = select(Persona).where(Persona.id == persona_id)
-        result = await session.execute(stmt)
+        result = await session.execute(_GET_PERSONA, {"persona_id": persona_id})
         persona = result.scalar_one_or_none()
 
         if not persona:
@@ -153,26 +146,23 @@ class PersonaService:
         deleted_conversations_count = 0
 
         if delete_conversations:
-            # Get all conversations that include this persona
-
-            conversations_stmt = (
-                select(Conversation.id)
+            # Conversations that include this persona, kept as a subquery so the ids
+            # never round-trip through Python
+            conversation_ids = (
+                select(ConversationPersona.conversation_id)
+                .where(ConversationPersona.persona_id == persona_id)
+                .scalar_subquery()
+            )
+            count_stmt = (
+                select(func.count(Conversation.id))
                 .join(ConversationPersona)
                 .where(ConversationPersona.persona_id == persona_id)
             )
-            conversations_result = await session.execute(conversations_stmt)
-            conversation_ids = [conv_id for conv_id, in conversations_result]
-            deleted_conversations_count = len(conversation_ids)
-
-            # Delete conversations directly using bulk delete to avoid relationship issues
-            if conversation_ids:
-                # First delete ConversationPersona relationships for these conversations
-                await session.execute(
-                    delete(ConversationPersona).where(
-                        ConversationPersona.conversation_id.in_(conversation_ids)
-                    )
-                )
+            deleted_conversations_count = (await session.execute(count_stmt)).scalar_one()
 
+            # Delete conversations directly using bulk delete to avoid relationship issues.
+            # The junction rows go last since the subquery reads them.
+            if deleted_conversations_count:
                 # Delete message attachments for these conversations
                 await session.execute(
                     delete(MessageAttachment).where(
@@ -185,6 +175,13 @@ class PersonaService:
                 await session.execute(
                     delete(Conversation).where(Conversation.id.in_(conversation_ids))
                 )
+
+                # Delete ConversationPersona relationships for these conversations
+                await session.execute(
+                    delete(ConversationPersona).where(
+                        ConversationPersona.conversation_id.in_(conversation_ids)
+                    )
+                )
         else:
             # Just delete ConversationPersona relationships for this persona
             await session.execute(
@@ -196,6 +193,7 @@ class PersonaService:
         # Delete the persona
         await session.delete(persona)
         await session.commit()
+        persona_section_cache.invalidate()
 
         return {
             "message": "Persona deleted successfully",
@@ -208,11 +206,12 @@ class PersonaService:
         self, name: str, session, exclude_id: int = None
     ) -> bool:
         """Check if a persona name is available."""
-        stmt = select(Persona).where(Persona.name == name)
         if exclude_id:
-            stmt = stmt.where(Persona.id != exclude_id)
-
-        result = await session.execute(stmt)
+            result = await session.execute(
+                _PERSONA_ID_BY_NAME_EXCLUDING, {"name": name, "exclude_id": exclude_id}
+            )
+        else:
+            result = await session.execute(_PERSONA_ID_BY_NAME, {"name": name})
         existing = result.scalar_one_or_none()
 
         return existing is None
@@ -221,7 +220,7 @@ class PersonaService:
     async def search_personas(self, session, query: str) -> List[Dict[str, Any]]:
         """Search personas by name or description."""
         stmt = (
-            select(Persona)
+            select(*_PERSONA_COLUMNS)
             .where(
                 Persona.name.ilike(f"%{query}%")
                 | Persona.description.ilike(f"%{query}%")
@@ -230,24 +229,7 @@ class PersonaService:
         )
 
         result = await session.execute(stmt)
-        personas = []
-        for persona in result.scalars():
-            personas.append(
-                {
-                    "id": persona.id,
-                    "name": persona.name,
-                    "description": persona.description,
-                    "avatar_url": persona.avatar_url,
-                    "created_at": (
-                        persona.created_at.isoformat() if persona.created_at else None
-                    ),
-                    "updated_at": (
-                        persona.updated_at.isoformat() if persona.updated_at else None
-                    ),
-                }
-            )
-
-        return personas
+        return [_persona_to_dict(row) for row in result.all()]
 
     @with_db_session
     async def get_persona_names_for_conversation(
@@ -256,12 +238,9 @@ class PersonaService:
         """Get the persona names for a given conversation."""
         if conversation_id is None:
             return []
-        stmt = (
-            select(Persona.name)
-            .join(ConversationPersona)
-            .where(ConversationPersona.conversation_id == conversation_id)
+        result = await session.execute(
+            _PERSONA_NAMES_FOR_CONVERSATION, {"conversation_id": conversation_id}
         )
-        result = await session.execute(stmt)
         return result.scalars().all()
 
 
@@ -0,0 +1,162 @@
+"""
+Rate limit service for upstream OpenAI-compatible API calls.
+
+This service handles:
+- Adaptive (AIMD) concurrency limits per endpoint/model
+- Sliding-window request throttling from provider rate limit headers
+- Backing off on 429 / 5xx responses and Retry-After hints
+"""
+
+from collections import deque
+from typing import Deque, Dict, Mapping, Optional, Tuple
+import asyncio
+import logging
+import re
+import time
+
+from openai import APIStatusError
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse Retry-After / x-ratelimit-reset-* values ("2", "1.5s", "6m0s", "250ms") into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class AIMDRateLimiter:
+    """Concurrency limiter that grows additively on success and halves on overload.
+
+    Use as an async context manager around admitting a single upstream request
+    (the create call and its headers, not the streamed body); the outcome of
+    the block (success, 429/5xx error) adjusts the limit. Requests are not held
+    back at all until the provider signals a limit (a 429/5xx or rate limit
+    headers).
+    """
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, initial_limit: float = 32, min_limit: float = 1, max_limit: float = 32):
+        self.limit = float(initial_limit)
+        # Off until the provider shows it limits us; until then nothing waits
+        self.throttled = False
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.requests_per_minute: Optional[int] = None
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._request_times: Deque[float] = deque()
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> "AIMDRateLimiter":
+        async with self._condition:
+            while self.throttled:
+                delay = self._admission_delay()
+                if delay <= 0 and self._in_flight < max(1, int(self.limit)):
+                    break
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await self._condition.wait()
+            self._in_flight += 1
+            now = time.monotonic()
+            self._request_times.append(now)
+            self._trim_window(now)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is None:
+            self.on_success()
+        elif isinstance(exc_val, APIStatusError):
+            self.on_error(exc_val.status_code, exc_val.response.headers)
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+        return False
+
+    def _admission_delay(self) -> float:
+        """Seconds until another request may start (0 if it can start now)."""
+        now = time.monotonic()
+        delay = self._blocked_until - now
+        if self.requests_per_minute:
+            self._trim_window(now)
+            if len(self._request_times) >= self.requests_per_minute:
+                delay = max(delay, self._request_times[0] + self.WINDOW_SECONDS - now)
+        return delay
+
+    def _trim_window(self, now: float) -> None:
+        """Forget request start times older than the sliding window."""
+        window_start = now - self.WINDOW_SECONDS
+        while self._request_times and self._request_times[0] <= window_start:
+            self._request_times.popleft()
+
+    def on_success(self) -> None:
+        """Additive increase: roughly +1 to the limit per window of successful requests."""
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_error(self, status_code: int, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Multiplicative decrease on rate limiting or server overload."""
+        if status_code != 429 and status_code < 500:
+            return
+        self.throttled = True
+        self.limit = max(self.min_limit, self.limit / 2)
+        retry_after = _parse_duration((headers or {}).get("retry-after"))
+        if retry_after:
+            self._block_for(retry_after)
+        logger.warning(
+            "Upstream returned %s; concurrency limit reduced to %.1f", status_code, self.limit
+        )
+
+    def observe(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Learn from x-ratelimit-* response headers to throttle before hitting 429s."""
+        if not headers:
+            return
+        limit_requests = headers.get("x-ratelimit-limit-requests")
+        if limit_requests and limit_requests.isdigit():
+            self.requests_per_minute = int(limit_requests) or None
+            if self.requests_per_minute:
+                self.throttled = True
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.strip() == "0":
+            reset = _parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.throttled = True
+                self._block_for(reset)
+
+    def _block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class RateLimitService:
+    """Registry of rate limiters keyed by (base_url, model_name)."""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], AIMDRateLimiter] = {}
+
+    def get_limiter(self, base_url: str, model_name: str) -> AIMDRateLimiter:
+        """Get the shared limiter for an endpoint/model pair."""
+        key = (base_url, model_name)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = self._limiters[key] = AIMDRateLimiter()
+        return limiter
+
+
+# Global rate limit service instance
+rate_limit_service = RateLimitService()
@@ -5,8 +5,33 @@ This service handles the conversion of internal service events to SSE format,
 providing a centralized way to format streaming responses for web clients.
 """
 
-import json
-from typing import Dict, Any, AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+
+from utils.json_utils import dumps_bytes
+
+_DATA_PREFIX = b"data: "
+_EVENT_END = b"\n\n"
+
+
+def _frame(payload: Any) -> bytes:
+    """Encode a payload as a single SSE data frame."""
+    return _DATA_PREFIX + dumps_bytes(payload) + _EVENT_END
+
+
+_OBJECT_EVENT_END = b"}" + _EVENT_END
+
+# Service event type -> (pre-rendered frame prefix, event field to embed, default).
+# Only the embedded field is encoded per event; a None field means the prefix is
+# the whole frame.
+_EVENT_TEMPLATES: Dict[str, Tuple[bytes, Optional[str], Any]] = {
+    "start": (_frame({"type": "stream_start"}), None, None),
+    "chunk": (b'data: {"type":"stream_chunk","content":', "content", ""),
+    "system_chunk": (b'data: {"type":"system_chunk","content":', "content", ""),
+    "system_complete": (b'data: {"type":"system_complete","message":', "message", {}),
+    "message_complete": (b'data: {"type":"message_complete","message":', "message", {}),
+    "complete": (b'data: {"type":"complete","content":', "content", ""),
+    "error": (b'data: {"error":', "message", ""),
+}
 
 
 class SSEService:
@@ -24,54 +49,30 @@ class SSEService:
             "X-Accel-Buffering": "no",  # Disable nginx buffering
         }
 
-    def convert_event_to_sse(self, event: Dict[str, Any]) -> str:
+    def convert_event_to_sse(self, event: Dict[str, Any]) -> bytes:
         """Convert a service event to SSE format.
         
         Args:
             event: Event dictionary from service layer
             
         Returns:
-            SSE-formatted string ready for streaming
+            SSE-formatted bytes ready for streaming
         """
-        event_type = event.get("type")
-        
-        # Handle different event types with appropriate SSE formatting
-        if event_type == "start":
-            return f"data: {json.dumps({'type': 'stream_start'})}\n\n"
-            
-        elif event_type == "chunk":
-            content = event.get('content', '')
-            return f"data: {json.dumps({'type': 'stream_chunk', 'content': content})}\n\n"
-            
-        elif event_type == "system_chunk":
-            content = event.get('content', '')
-            return f"data: {json.dumps({'type': 'system_chunk', 'content': content})}\n\n"
-            
-        elif event_type == "system_complete":
-            message_data = event.get("message", {})
-            return f"data: {json.dumps({'type': 'system_complete', 'message': message_data})}\n\n"
-            
-        elif event_type == "message_complete":
-            message_data = event.get("message", {})
-            return f"data: {json.dumps({'type': 'message_complete', 'message': message_data})}\n\n"
-            
-        elif event_type == "complete":
-            content = event.get('content', '')
-            return f"data: {json.dumps({'type': 'complete', 'content': content})}\n\n"
-            
-        elif event_type == "error":
-            err_msg = event.get('message', '')
-            return f"data: {json.dumps({'error': err_msg})}\n\n"
-            
-        else:
+        template = _EVENT_TEMPLATES.get(event.get("type"))
+        if template is None:
             # Unknown event type, pass through with minimal formatting
-            return f"data: {json.dumps(event)}\n\n"
+            return _frame(event)
+
+        prefix, field, default = template
+        if field is None:
+            return prefix
+        return prefix + dumps_bytes(event.get(field, default)) + _OBJECT_EVENT_END
 
     async def stream_service_events(
         self, 
         events: AsyncGenerator[Dict[str, Any], None], 
         error_prefix: str = "Error"
-    ) -> AsyncGenerator[str, None]:
+    ) -> AsyncGenerator[bytes, None]:
         """Convert a stream of service events to SSE format.
         
         Args:
@@ -79,16 +80,22 @@ class SSEService:
             error_prefix: Prefix for error messages
             
         Yields:
-            SSE-formatted strings
+            SSE-formatted byte strings
         """
+        convert = self.convert_event_to_sse
+        chunk_prefix = _EVENT_TEMPLATES["chunk"][0]
         try:
             async for event in events:
-                yield self.convert_event_to_sse(event)
+                # Token chunks dominate a stream; frame them without the generic dispatch
+                if event.get("type") == "chunk":
+                    yield chunk_prefix + dumps_bytes(event.get("content", "")) + _OBJECT_EVENT_END
+                else:
+                    yield convert(event)
         except Exception as e:
             error_event = {"error": f"{error_prefix}: {str(e)}"}
-            yield f"data: {json.dumps(error_event)}\n\n"
+            yield _frame(error_event)
 
-    def format_custom_event(self, event_type: str, data: Dict[str, Any]) -> str:
+    def format_custom_event(self, event_type: str, data: Dict[str, Any]) -> bytes:
         """Format a custom event for SSE streaming.
         
         Args:
@@ -96,10 +103,10 @@ class SSEService:
             data: Event data dictionary
             
         Returns:
-            SSE-formatted string
+            SSE-formatted bytes
         """
         event_data = {"type": event_type, **data}
-        return f"data: {json.dumps(event_data)}\n\n"
+        return _frame(event_data)
 
 
 # Global service instance
@@ -6,23 +6,52 @@ parts of the application, particularly for SSE event subscriptions and KV watchi
 """
 
 import asyncio
-import aiosqlite
+import sqlite3
 from typing import List, Dict, Optional
 from .websocket_service import websocket_service
 from .kv_store_service import kv_store
+from .log_service import logger
+
+# Errors meaning the KV connection itself is closed rather than a single query failing:
+# sqlite3's closed-database error and aiosqlite's errors once its connection is gone
+_CONNECTION_ERRORS = (
+    (sqlite3.ProgrammingError, "Cannot operate on a closed database"),
+    (ValueError, "no active connection"),
+    (ValueError, "Connection closed"),
+)
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """Whether an error means the shared KV connection has to be reopened."""
+    return any(
+        isinstance(error, error_type) and str(error).startswith(message)
+        for error_type, message in _CONNECTION_ERRORS
+    )
 
 
 class StateService:
     """Service for managing shared application state."""
 
+    # Seconds to keep collecting KV changes before broadcasting a batch
+    KV_BATCH_WINDOW = 0.05
+
     def __init__(self):
         # Condition results cache for tracking changes
         self.condition_results_cache: Dict[str, bool] = {}
+        # Set when tool conditions may have changed; wakes the condition checker
+        self.conditions_dirty = asyncio.Event()
+        # Bumped on every mark; condition results cached under an older value are stale
+        self.conditions_version = 0
         
         # KV Watcher system
         self.kv_watcher_task: Optional[asyncio.Task] = None
         self.kv_watcher_running: bool = False
 
+    def mark_conditions_dirty(self):
+        """Ask the tool condition checker to re-evaluate conditions now."""
+        self.conditions_version += 1
+        self.conditions_dirty.set()
+
     def start_kv_watcher(self, poll_ms: int = 1000):
         """Start the shared KV watcher if not already running."""
         if self.kv_watcher_running:
@@ -41,53 +70,113 @@ class StateService:
         self.kv_watcher_task = None
 
     async def _kv_watcher_loop(self, poll_ms: int):
-        """Internal shared KV watcher loop."""
+        """Internal shared KV watcher loop.
+
+        Writes made through kv_store arrive on its change queue and are broadcast in
+        small batches. Polling only remains to pick up writes made by other
+        connections (e.g. an external DB client).
+        """
         
-        db_path = getattr(kv_store, "db_path", "data.db")
+        changes = kv_store.subscribe_changes()
         last_updated: Dict[str, str | None] = {}
+        last_marker = None
+        poll_interval = max(0.05, poll_ms / 1000)
         
-        while True:
-            try:
-                # Check if we have any WebSocket subscribers
-                if websocket_service.get_connection_count() == 0:
-                    # No subscribers, sleep longer
-                    await asyncio.sleep(max(1.0, poll_ms / 1000))
-                    continue
+        try:
+            while True:
+                try:
+                    # Check if we have any WebSocket subscribers
+                    if websocket_service.get_connection_count() == 0:
+                        # No subscribers, drop pending changes and sleep longer
+                        while not changes.empty():
+                            changes.get_nowait()
+                        await asyncio.sleep(max(1.0, poll_ms / 1000))
+                        continue
+                    
+                    try:
+                        key = await asyncio.wait_for(changes.get(), timeout=poll_interval)
+                    except asyncio.TimeoutError:
+                        # Nothing written in-process; check for writes from other connections
+                        marker = await kv_store.external_change_marker()
+                        if marker != last_marker:
+                            last_marker = marker
+                            await self._broadcast_kv_updates(await self._scan_changed_keys(last_updated))
+                        continue
                     
-                async with aiosqlite.connect(db_path) as conn:
-                    # Get all keys and their updated_at timestamps
-                    cursor = await conn.execute("SELECT key, updated_at FROM kv_store")
-                    rows = await cursor.fetchall()
+                    await self._broadcast_kv_updates(await self._collect_changes(changes, key))
                     
-                    for key, updated_at in rows:
-                        if last_updated.get(key) != updated_at:
-                            last_updated[key] = updated_at
-                            
-                            # Get the actual value
-                            try:
-                                current_value = await kv_store.get(key, None)
-                                current_len = await kv_store.llen(key) if isinstance(current_value, list) else 0
-                            except Exception:
-                                current_value = None
-                                current_len = 0
-                            
-                            payload = {"type": "kv_update", "key": key, "value": current_value, "len": current_len}
-                            
-                            # Broadcast to WebSocket subscribers
-                            try:
-                                # Only broadcast to "all" subscribers (simplified approach)
-                                await websocket_service.broadcast_to_topic("*", payload)
-                            except Exception as e:
-                                print(f"Error broadcasting to WebSocket subscribers: {e}")
-                
-                await asyncio.sleep(max(0.05, poll_ms / 1000))
-                
-            except asyncio.CancelledError:
+                except asyncio.CancelledError:
+                    break
+                except Exception as e:
+                    # Log error and continue
+                    logger.exception("KV watcher loop error")
+                    if _is_connection_error(e):
+                        # The shared connection is unusable (closed or its worker died); reopen it
+                        await kv_store.reconnect()
+                    await asyncio.sleep(1.0)
+        finally:
+            kv_store.unsubscribe_changes()
+
+    async def _collect_changes(self, changes: asyncio.Queue, first_key: str) -> List[str]:
+        """Gather keys arriving within a short window after first_key, deduplicated."""
+        keys = {first_key: None}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.KV_BATCH_WINDOW
+        while True:
+            while not changes.empty():
+                keys[changes.get_nowait()] = None
+            remaining = deadline - loop.time()
+            if remaining <= 0:
                 break
-            except Exception as e:
-                # Log error and continue
-                print(f"Error in KV watcher loop: {e}")
-                await asyncio.sleep(1.0)
+            try:
+                keys[await asyncio.wait_for(changes.get(), timeout=remaining)] = None
+            except asyncio.TimeoutError:
+                break
+        return list(keys)
+
+    async def _scan_changed_keys(self, last_updated: Dict[str, str | None]) -> List[str]:
+        """Find keys whose updated_at moved since the last scan."""
+        # Get all keys and their updated_at timestamps
+        rows = await kv_store.scan_updated_at()
+        
+        changed = []
+        for key, updated_at in rows:
+            if last_updated.get(key) != updated_at:
+                last_updated[key] = updated_at
+                changed.append(key)
+                # Written outside this process, so the store's read cache is stale
+                kv_store.invalidate(key)
+        return changed
+
+    async def _broadcast_kv_updates(self, keys: List[str]):
+        """Broadcast the current values of changed keys to WebSocket subscribers."""
+        if not keys:
+            return
+        
+        # Tool conditions are derived from KV state, so they may have flipped too
+        self.mark_conditions_dirty()
+        
+        # Fetch all changed values in one query
+        try:
+            current_values = await kv_store.get_many(keys)
+        except Exception:
+            current_values = {}
+        
+        updates = []
+        for key in keys:
+            current_value = current_values.get(key)
+            current_len = len(current_value) if isinstance(current_value, list) else 0
+            updates.append({"type": "kv_update", "key": key, "value": current_value, "len": current_len})
+        
+        # Several changes go out as one kv_batch frame; clients unpack it into kv_updates
+        payload = updates[0] if len(updates) == 1 else {"type": "kv_batch", "updates": updates}
+        
+        # Broadcast to WebSocket subscribers
+        try:
+            # Only broadcast to "all" subscribers (simplified approach)
+            await websocket_service.broadcast_to_topic("*", payload)
+        except Exception as e:
+            logger.warning("WS broadcast failed: %s", e)
 
 
 # Global service instance
@@ -5,27 +5,96 @@ This service handles intelligent prompt suggestions based on conversation contex
 and active personas, providing contextually relevant user prompt recommendations.
 """
 
+import time
 from typing import Dict, Any, List, Optional, AsyncGenerator
-from sqlalchemy import select
-from models import Persona, ConversationPersona
 from services.ai_service import ai_service
 from services.conversation_service import conversation_service
 from services.chat_service import inference_loop
-from services.data_access_service import with_db_session
 from utils.constants import ERROR_NO_OPENAI_API_KEY
 
 
+# Static instruction block of the suggestion prompt. It always leads the prompt
+# unchanged, so servers with prefix caching can reuse its prefill across requests.
+_SUGGESTION_PREFIX_HEAD = """Based on this conversation context, respond ONLY as the user. NEVER respond as the assistant or as any of the personas described below. The response should not be wrapped in quotes, it should not contain any other text, and it should be:
+
+- Relevant to the conversation context
+- Written in exactly the same tone and writing style as the user
+- Consistent in sentiment with the user's prior messages
+- Based solely on the moral and ethical perspectives of the user, NEVER steering the user's personality in a different direction.
+- You are the user, who is responding to the personas. NEVER respond as or from the perspective of any persona, assistant, or system message.
+- NEVER repeat past messages from the provided context. Write novel responses that advance the conversation and are relevant to the last message received.
+
+Conversation context:
+"""
+_SUGGESTION_PREFIX_TAIL = """
+
+Generate only the suggested prompt, nothing else."""
+
+
+# Token chunks are merged until this many characters or seconds have built up
+_CHUNK_FLUSH_CHARS = 64
+_CHUNK_FLUSH_SECONDS = 0.03
+
+
+# No-op tool callbacks for inference_loop (suggestions don't use tools)
+async def _get_no_tools():
+    return []
+
+
+async def _build_no_tool_prompt(*args):
+    return ""
+
+
+async def _run_no_tools_status(*args, **kwargs):
+    return ""
+
+
+def _get_no_tools_registry():
+    return {}
+
+
+
+async def _coalesce_chunks(
+    events: AsyncGenerator[Dict[str, Any], None]
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Merge consecutive chunk events so each SSE frame carries several tokens.
+
+    Buffered text is flushed once it is large or old enough, before any other
+    event type, and when the stream ends.
+    """
+    buffer: List[str] = []
+    size = 0
+    started = 0.0
+    async for event in events:
+        if event.get("type") == "chunk":
+            content = event.get("content") or ""
+            if not buffer:
+                started = time.monotonic()
+            buffer.append(content)
+            size += len(content)
+            if size >= _CHUNK_FLUSH_CHARS or time.monotonic() - started >= _CHUNK_FLUSH_SECONDS:
+                yield {"type": "chunk", "content": "".join(buffer)}
+                buffer.clear()
+                size = 0
+            continue
+        if buffer:
+            yield {"type": "chunk", "content": "".join(buffer)}
+            buffer.clear()
+            size = 0
+        yield event
+    if buffer:
+        yield {"type": "chunk", "content": "".join(buffer)}
+
+
 class SuggestionService:
     """Service for generating intelligent prompt suggestions."""
 
     def __init__(self):
         pass  # No longer need to store defaults, will get from ai_service
 
-    @with_db_session
     async def get_conversation_context(
         self, 
         conversation_id: str, 
-        session,
         context_limit: int = 6
     ) -> Dict[str, Any]:
         """Get conversation context including messages and personas.
@@ -41,22 +110,15 @@ class SuggestionService:
         persona_descriptions = []
         
         if conversation_id:
-            # Get recent conversation messages
-            conv_data = await conversation_service.get_conversation_messages(conversation_id)
-            messages = conv_data["messages"]
-            # Take the last N messages for context
-            context_messages = messages[-context_limit:] if len(messages) > context_limit else messages
-            
-            # Get persona descriptions for this conversation
-            personas_stmt = select(Persona).join(ConversationPersona).where(
-                ConversationPersona.conversation_id == conversation_id
+            # Recent messages and active personas come back from one query
+            bundle = await conversation_service.get_context_bundle(
+                conversation_id, limit=context_limit
             )
-            personas_result = await session.execute(personas_stmt)
-            personas = personas_result.scalars().all()
+            context_messages = bundle["messages"]
             
-            for persona in personas:
-                if persona.description:
-                    persona_descriptions.append(f"- {persona.name}: {persona.description}")
+            for persona in bundle["personas"]:
+                if persona["description"]:
+                    persona_descriptions.append(f"- {persona['name']}: {persona['description']}")
         
         return {
             "messages": context_messages,
@@ -78,10 +140,8 @@ class SuggestionService:
             Formatted prompt for AI suggestion generation
         """
         # Build context string from messages
-        context_text = ""
-        for msg in context_messages:
-            role = msg["role"].title()
-            context_text += f"{role}: {msg['content']}\n\n"
+        parts = [f"{msg['role'].title()}: {msg['content']}" for msg in context_messages]
+        context_text = "\n\n".join(parts) + "\n\n" if parts else ""
         
         # Add persona context if available
         persona_context = ""
@@ -89,19 +149,7 @@ class SuggestionService:
             persona_context = "\n\nActive personas in this conversation:\n" + "\n".join(persona_descriptions) + "\n"
         
         # Create prompt for suggestion generation
-        return f"""Based on this conversation context, respond ONLY as the user. NEVER respond as the assistant or as any of the personas described below. The response should not be wrapped in quotes, it should not contain any other text, and it should be:
-
-- Relevant to the conversation context
-- Written in exactly the same tone and writing style as the user
-- Consistent in sentiment with the user's prior messages
-- Based solely on the moral and ethical perspectives of the user, NEVER steering the user's personality in a different direction.
-- You are the user, who is responding to the personas. NEVER respond as or from the perspective of any persona, assistant, or system message.
-- NEVER repeat past messages from the provided context. Write novel responses that advance the conversation and are relevant to the last message received.
-
-Conversation context:
-{persona_context}{context_text}
-
-Generate only the suggested prompt, nothing else."""
+        return "".join((_SUGGESTION_PREFIX_HEAD, persona_context, context_text, _SUGGESTION_PREFIX_TAIL))
 
     async def generate_prompt_suggestion(
         self, 
@@ -137,21 +185,8 @@ Generate only the suggested prompt, nothing else."""
             # Create messages for API
             messages_for_api = [{"role": "user", "content": suggestion_prompt}]
 
-            # Create async functions for no-tools scenario (suggestions don't use tools)
-            async def get_no_tools():
-                return []
-            
-            async def build_no_tool_prompt(*args):
-                return ""
-            
-            async def run_no_tools_status(*args, **kwargs):
-                return ""
-            
-            def get_no_tools_registry():
-                return {}
-
             # Use streaming response with suggestion-optimized parameters
-            async for event in inference_loop(
+            events = inference_loop(
                 messages_for_api,
                 conversation_id=None,  # No conversation for suggestions
                 model_name=ai_settings["model_name"],
@@ -163,12 +198,13 @@ Generate only the suggested prompt, nothing else."""
                 frequency_penalty=suggestion_params["frequency_penalty"],
                 presence_penalty=suggestion_params["presence_penalty"],
                 tools_limit=0,  # No tools for suggestions
-                get_enabled_tools=get_no_tools,
-                build_tool_prompt=build_no_tool_prompt,
-                run_auto_tools_and_status=run_no_tools_status,
-                get_tools_registry=get_no_tools_registry,
-            ):
-                # Pass through all events from inference loop
+                get_enabled_tools=_get_no_tools,
+                build_tool_prompt=_build_no_tool_prompt,
+                run_auto_tools_and_status=_run_no_tools_status,
+                get_tools_registry=_get_no_tools_registry,
+            )
+            # Pass through all events from inference loop, merging token chunks
+            async for event in _coalesce_chunks(events):
                 yield event
 
         except Exception as e:
@@ -8,9 +8,13 @@ This service handles:
 - Multi-persona behavior instructions
 """
 
+import asyncio
+import time
+from collections import OrderedDict
 from datetime import datetime
+from types import MappingProxyType
 from typing import Optional, List, Any
-from sqlalchemy import select
+from sqlalchemy import bindparam, select
 import json
 
 from models import ConversationPersona, Persona
@@ -18,125 +22,261 @@ from services.kv_store_service import kv_store
 from services.data_access_service import with_db_session
 
 
+# KV settings read by the prompt builder, with their defaults
+_SYSTEM_PROMPT_SETTING_DEFAULTS = {
+    "system_prompt_thinking_mode": "default",
+    "system_prompt_enabled": True,
+    "system_prompts": "[]",
+    "system_prompt_include_datetime": False,
+}
+_USER_SETTING_DEFAULTS = {
+    "user_description": "",
+    "user_name": "User",
+}
+_PROMPT_SETTING_DEFAULTS = {**_SYSTEM_PROMPT_SETTING_DEFAULTS, **_USER_SETTING_DEFAULTS}
+
+# Thinking mode setting -> prefix placed at the start of the system prompt
+_THINKING_MAP = MappingProxyType({
+    "</think>": "\n\n</think>",
+    "/no_think": "/no_think",
+    "<no_think>": "<no_think>",
+    "<think>": "<think>",
+    "/think": "/think",
+})
+
+_MULTI_PERSONA_INSTRUCTIONS = (
+    "Multiple active personas are available. Choose the most appropriate persona from the list above to respond to the user's request based on content, tone, and expertise. "
+    "When you reply, always begin with the persona name followed by a colon and a space, then the message, exactly in this format: `[name]: [message]`. "
+    "Do not include any additional commentary or metadata outside of that format."
+)
+
+
+# Only the columns the persona section renders, fetched as plain rows
+_PERSONA_NAMES_AND_DESCRIPTIONS = (
+    select(Persona.name, Persona.description)
+    .join(ConversationPersona)
+    .where(ConversationPersona.conversation_id == bindparam("conversation_id"))
+)
+
+# (epoch second, rendered datetime line) from the last call
+_last_datetime_text = (-1, "")
+
+
+def _current_datetime_text() -> str:
+    """Render the current date/time line, reusing it for calls within the same second."""
+    global _last_datetime_text
+    second = int(time.time())
+    if second != _last_datetime_text[0]:
+        current_time = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+        _last_datetime_text = (second, f"Current date and time: {current_time}")
+    return _last_datetime_text[1]
+
+
+
+def _render_persona_section(personas) -> str:
+    """Render the active persona block and behavioral instructions from (name, description) rows."""
+    if not personas:
+        return ""
+
+    # Build a descriptive block of personas
+    lines = ["Active Personas:"]
+    for p in personas:
+        desc = p.description or ""
+        lines.append(f"- {p.name}: {desc}")
+
+    # Behavioral instructions depending on how many personas are active
+    if len(personas) == 1:
+        instructions = (
+            f"Only respond as {personas[0].name}. Use the persona description above to shape your tone, style, and content. "
+            "Do not speak as any other persona or as yourself — always reply strictly in the voice of the persona."
+        )
+    else:
+        # Multiple personas: ask model to pick and format responses explicitly
+        instructions = _MULTI_PERSONA_INSTRUCTIONS
+    return "".join(("\n\n", "\n".join(lines), "\n\n", instructions))
+
+
+class PersonaSectionCache:
+    """Rendered persona sections per conversation, dropped whenever persona data changes."""
+
+    def __init__(self, max_size: int = 256):
+        self._sections: "OrderedDict[str, str]" = OrderedDict()
+        self._max_size = max_size
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter that moves on every invalidation; take it before loading a section."""
+        return self._generation
+
+    def get(self, conversation_id: str) -> Optional[str]:
+        section = self._sections.get(conversation_id)
+        if section is not None:
+            self._sections.move_to_end(conversation_id)
+        return section
+
+    def put(self, conversation_id: str, section: str, generation: int) -> None:
+        """Store a section loaded at ``generation`` unless something was invalidated since."""
+        if generation != self._generation:
+            return
+        self._sections[conversation_id] = section
+        self._sections.move_to_end(conversation_id)
+        if len(self._sections) > self._max_size:
+            self._sections.popitem(last=False)
+
+    def invalidate(self, conversation_id: Optional[str] = None) -> None:
+        """Drop one conversation's section, or all of them (e.g. after a persona edit)."""
+        self._generation += 1
+        if conversation_id is None:
+            self._sections.clear()
+        else:
+            self._sections.pop(conversation_id, None)
+
+
+class SettingsCache:
+    """Resolved prompt settings, reused until one of the settings keys is written."""
+
+    def __init__(self):
+        # Bumped on every write to a settings key
+        self._version = 0
+        self._values: Optional[MappingProxyType] = None
+        kv_store.add_write_listener(self._on_kv_write)
+
+    def _on_kv_write(self, key: Optional[str]) -> None:
+        """Drop the cached settings when a settings key (or possibly any key) changes."""
+        if key is None or key in _PROMPT_SETTING_DEFAULTS:
+            self._version += 1
+            self._values = None
+
+    async def get(self) -> MappingProxyType:
+        """Return the prompt settings as a read-only mapping."""
+        # Writes from other connections only reach the listener through this check
+        await kv_store.check_external_changes()
+        if self._values is not None:
+            return self._values
+        version = self._version
+        values = await kv_store.get_many(
+            list(_PROMPT_SETTING_DEFAULTS), defaults=_PROMPT_SETTING_DEFAULTS
+        )
+        # system_prompts is stored as a JSON string inside the JSON value; decode
+        # it here so prompt builds reuse the parsed list until the next write
+        system_prompts = values["system_prompts"]
+        if isinstance(system_prompts, str):
+            system_prompts = json.loads(system_prompts)
+        values["system_prompts"] = tuple(system_prompts or ())
+        settings = MappingProxyType(values)
+        # A settings write landing mid-read forces a refetch next time
+        if version == self._version:
+            self._values = settings
+        return settings
+
+
 class SystemPromptService:
     """Service for building system prompts with persona and user context."""
 
+    def __init__(self):
+        self._settings_cache = SettingsCache()
+        # (settings, datetime text, rendered sections) from the last prompt build
+        self._base_sections_memo: Optional[tuple] = None
+
     @with_db_session
     async def build_system_prompt(
         self, session, conversation_id: Optional[str] = None
     ) -> str:
         """Build the system prompt with optional datetime injection and append active personas for a conversation"""
+        # Fetch every setting the prompt depends on (cached until the KV store is
+        # written), concurrently with the persona section (cached per conversation)
+        settings, persona_section = await asyncio.gather(
+            self._settings_cache.get(),
+            self._get_persona_section(session, conversation_id),
+        )
+
+        # Everything but the persona section depends only on the settings and the
+        # clock, so it is reused while both are unchanged
+        datetime_text = None
+        if settings["system_prompt_include_datetime"]:
+            datetime_text = _current_datetime_text()
+        memo = self._base_sections_memo
+        if memo is not None and memo[0] is settings and memo[1] == datetime_text:
+            thinking_prefix, base_prompt, user_section = memo[2]
+        else:
+            thinking_prefix, base_prompt, user_section = self._build_base_sections(
+                settings, datetime_text
+            )
+            self._base_sections_memo = (
+                settings, datetime_text, (thinking_prefix, base_prompt, user_section)
+            )
+
+        # Combine all parts with proper spacing
+        final_prompt = ""
+        if thinking_prefix:
+            final_prompt += thinking_prefix
+            if base_prompt or user_section or persona_section:
+                final_prompt += "\n\n"
+
+        final_prompt += (base_prompt or "") + user_section + persona_section
+        return final_prompt
+
+    def _build_base_sections(self, settings: dict, datetime_text: Optional[str]) -> tuple:
+        """Render the thinking prefix, base prompt and user section from settings."""
         # Get thinking mode setting and apply it at the beginning
-        thinking_mode = await kv_store.get("system_prompt_thinking_mode", "default")
-        thinking_prefix = ""
-
-        if thinking_mode != "default":
-            # Map the thinking mode to the appropriate string
-            thinking_map = {
-                "</think>": "\n\n</think>",
-                "/no_think": "/no_think",
-                "<no_think>": "<no_think>",
-                "<think>": "<think>",
-                "/think": "/think",
-            }
-            thinking_prefix = thinking_map.get(thinking_mode, "")
-
-        enabled = await kv_store.get("system_prompt_enabled", True)
+        # ("default" is not in the map, so it yields no prefix)
+        thinking_prefix = _THINKING_MAP.get(settings["system_prompt_thinking_mode"], "")
+
+        enabled = settings["system_prompt_enabled"]
         if not enabled:
             base_prompt = ""
         else:
-            # Get system_prompts array and join content with \n\n
-            system_prompts_data = await kv_store.get("system_prompts", "[]")
-            if isinstance(system_prompts_data, str):
-                system_prompts = json.loads(system_prompts_data)
-            else:
-                system_prompts = system_prompts_data or []
-
+            # Join the (already parsed) system_prompts content with \n\n
             base_prompt = "\n\n".join(
-                item.get("content", "") for item in system_prompts
+                item.get("content", "") for item in settings["system_prompts"]
             )
 
-        include_datetime = await kv_store.get("system_prompt_include_datetime", False)
-        if include_datetime:
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            datetime_text = f"Current date and time: {current_time}"
+        if datetime_text:
             if base_prompt:
                 base_prompt = f"{base_prompt}\n\n{datetime_text}"
             else:
                 base_prompt = datetime_text
 
         # Add user description (the persona who uses the User role)
-        user_description = await kv_store.get("user_description", "")
-        user_name = await kv_store.get("user_name", "User")
+        user_description = settings["user_description"]
+        user_name = settings["user_name"]
         user_section = ""
         if user_description:
             user_section = f"\n\nUser's Name: {user_name}\n\nUser Description (this describes the persona that plays the 'User' role):\n{user_description}"
 
-        # If a conversation_id is provided, append active persona descriptions
-        persona_section = ""
-        if conversation_id is not None:
-            try:
-                stmt = (
-                    select(Persona)
-                    .join(ConversationPersona)
-                    .where(ConversationPersona.conversation_id == conversation_id)
-                )
-                result = await session.execute(stmt)
-                personas = result.scalars().all()
-                if personas:
-                    # Build a descriptive block of personas
-                    lines = ["Active Personas:"]
-                    for p in personas:
-                        desc = p.description or ""
-                        lines.append(f"- {p.name}: {desc}")
-
-                    # Behavioral instructions depending on how many personas are active
-                    if len(personas) == 1:
-                        p = personas[0]
-                        persona_section = "\n\n" + "\n".join(lines) + "\n\n"
-                        persona_section += (
-                            f"Only respond as {p.name}. Use the persona description above to shape your tone, style, and content. "
-                            "Do not speak as any other persona or as yourself — always reply strictly in the voice of the persona."
-                        )
-                    else:
-                        # Multiple personas: ask model to pick and format responses explicitly
-                        persona_section = "\n\n" + "\n".join(lines) + "\n\n"
-                        persona_section += (
-                            "Multiple active personas are available. Choose the most appropriate persona from the list above to respond to the user's request based on content, tone, and expertise. "
-                            "When you reply, always begin with the persona name followed by a colon and a space, then the message, exactly in this format: `[name]: [message]`. "
-                            "Do not include any additional commentary or metadata outside of that format."
-                        )
-            except Exception:
-                # Non-fatal — just skip persona section if there's an error
-                persona_section = ""
+        return thinking_prefix, base_prompt, user_section
 
-        # Combine all parts with proper spacing
-        final_prompt = ""
-        if thinking_prefix:
-            final_prompt += thinking_prefix
-            if base_prompt or user_section or persona_section:
-                final_prompt += "\n\n"
+    async def _get_persona_section(self, session, conversation_id: Optional[str]) -> str:
+        """Get the rendered persona section for a conversation (empty when there is none or on error)."""
+        if conversation_id is None:
+            return ""
+        cached = persona_section_cache.get(conversation_id)
+        if cached is not None:
+            return cached
 
-        final_prompt += (base_prompt or "") + user_section + persona_section
-        return final_prompt
+        generation = persona_section_cache.generation
+        try:
+            result = await session.execute(
+                _PERSONA_NAMES_AND_DESCRIPTIONS, {"conversation_id": conversation_id}
+            )
+            personas = result.all()
+        except Exception:
+            # Non-fatal — just skip persona section if there's an error
+            return ""
+
+        persona_section = _render_persona_section(personas)
+        persona_section_cache.put(conversation_id, persona_section, generation)
+        return persona_section
 
     async def get_system_prompt_settings(self) -> dict:
         """Get current system prompt settings."""
-        system_prompts_data = await kv_store.get("system_prompts", "[]")
-        if isinstance(system_prompts_data, str):
-            system_prompts = json.loads(system_prompts_data)
-        else:
-            system_prompts = system_prompts_data or []
-
+        settings = await self._settings_cache.get()
         return {
-            "system_prompts": system_prompts,
-            "include_datetime": await kv_store.get(
-                "system_prompt_include_datetime", False
-            ),
-            "enabled": await kv_store.get("system_prompt_enabled", True),
-            "thinking_mode": await kv_store.get(
-                "system_prompt_thinking_mode", "default"
-            ),
+            "system_prompts": list(settings["system_prompts"]),
+            "include_datetime": settings["system_prompt_include_datetime"],
+            "enabled": settings["system_prompt_enabled"],
+            "thinking_mode": settings["system_prompt_thinking_mode"],
         }
 
     async def save_system_prompt_settings(
@@ -151,10 +291,12 @@ class SystemPromptService:
         prompts_data = [
             {"title": item.title, "content": item.content} for item in system_prompts
         ]
-        await kv_store.set("system_prompts", json.dumps(prompts_data))
-        await kv_store.set("system_prompt_include_datetime", include_datetime)
-        await kv_store.set("system_prompt_enabled", enabled)
-        await kv_store.set("system_prompt_thinking_mode", thinking_mode)
+        await kv_store.set_many({
+            "system_prompts": json.dumps(prompts_data),
+            "system_prompt_include_datetime": include_datetime,
+            "system_prompt_enabled": enabled,
+            "system_prompt_thinking_mode": thinking_mode,
+        })
 
         return {
             "system_prompts": prompts_data,
@@ -165,22 +307,25 @@ class SystemPromptService:
 
     async def get_user_description_settings(self) -> dict:
         """Get user description settings."""
-        return {
-            "user_description": await kv_store.get("user_description", ""),
-            "user_name": await kv_store.get("user_name", "User"),
-        }
+        settings = await self._settings_cache.get()
+        return {key: settings[key] for key in _USER_SETTING_DEFAULTS}
 
     async def save_user_description_settings(
         self, user_description: str, user_name: str = "User"
     ) -> dict:
         """Save user description settings."""
-        await kv_store.set("user_description", user_description or "")
-        await ("user_name", user_name or "User")
+        await kv_store.set_many({
+            "user_description": user_description or "",
+            "user_name": user_name or "User",
+        })
         return {
             "user_description": user_description or "",
             "user_name": user_name or "User",
         }
 
 
+# Global persona section cache, invalidated by the conversation and persona services
+persona_section_cache = PersonaSectionCache()
+
 # Global system prompt service instance
 system_prompt_service = SystemPromptService()
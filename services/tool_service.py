@@ -10,32 +10,229 @@ This service handles:
 """
 
 import json
+import logging
 import os
 import sys
+import time
 import asyncio
+import bisect
 import inspect
 import importlib.util
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime
 from services.state_service import state_service
 from services.kv_store_service import kv_store
 from services.websocket_service import websocket_service
 from services.log_service import logger
 
+# Seconds to wait before persisting enabled_tools, so bursts of toggles share one write
+ENABLED_FLUSH_DELAY = 0.05
+
+# Seconds a condition result is reused by get_tool_features, so bursts of UI
+# feature requests don't re-run every condition
+FEATURE_CONDITION_TTL = 0.5
+
+# Distinct (tool set, tools used) prompts kept by build_tool_prompt
+PROMPT_CACHE_SIZE = 128
+
+# Seconds check_tool_conditions waits for a dirty signal before re-checking anyway,
+# for conditions that change without going through the KV store
+CONDITION_FALLBACK_INTERVAL = 10.0
+
+# (label, registry key) pairs shown next to each tool in the startup listing
+_TOOL_FLAGS = (
+    ("auto", "auto_tool"),
+    ("one-time", "one_time"),
+    ("ui", "ui_feature"),
+    ("metadata", "supports_metadata"),
+    ("conditional", "condition"),
+)
+
+
+def _accepts_parameter(fn, name: str) -> bool:
+    """Whether fn's signature has a parameter called name (False if it can't be inspected)."""
+    try:
+        return name in inspect.signature(fn).parameters
+    except Exception:
+        return False
+
+
+def _iter_tool_files(tools_dir: str):
+    """Yield (path, dotted module name) for every tool file under tools_dir.
+
+    Walks with os.scandir, building module names from the directory prefix as
+    it descends; files starting with "_" or not ending in ".py" are skipped.
+    """
+    stack = [(tools_dir, "")]
+    while stack:
+        path, prefix = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        for entry in entries:
+            name = entry.name
+            if entry.is_dir():
+                subdirs.append((entry.path, f"{prefix}{name}."))
+            elif name.endswith(".py") and not name.startswith("_"):
+                yield entry.path, f"{prefix}{name[:-3]}"
+        # Visit subdirectories in listing order, after this directory's files
+        stack.extend(reversed(subdirs))
+
+
+# (epoch millisecond, ISO timestamp) from the last handler metadata build
+_last_timestamp = (-1, "")
+
+
+def _current_timestamp() -> str:
+    """Local ISO timestamp for handler metadata, reused for calls within the same millisecond."""
+    global _last_timestamp
+    ms = int(time.time() * 1000)
+    if ms != _last_timestamp[0]:
+        _last_timestamp = (ms, datetime.fromtimestamp(ms / 1000).isoformat(timespec="milliseconds"))
+    return _last_timestamp[1]
+
+
+def _format_tools(registry: Dict[str, Dict[str, Any]]):
+    """Yield the lines of the startup tool listing."""
+    if not registry:
+        yield "[Ghostpad] Tools: none found"
+        return
+    yield f"[Ghostpad] Tools detected ({len(registry)}):"
+    for tool_id in sorted(registry):
+        tool = registry[tool_id]
+        status = "enabled" if tool.get("enabled") else "disabled"
+        flags = [flag for flag, key in _TOOL_FLAGS if tool.get(key)]
+        flags_str = f" ({', '.join(flags)})" if flags else ""
+        yield f"  - {tool_id} [{status}]{flags_str}"
+
+
+def _make_invoker(fn):
+    """Adapt a sync or async callable into a coroutine function, deciding once at load time.
+
+    Plain sync callables run in a worker thread so blocking work inside a tool
+    doesn't stall the event loop (broadcasts, condition polling, other requests).
+    """
+    if not callable(fn):
+        return None
+    if inspect.iscoroutinefunction(fn):
+        return fn
+
+    if inspect.isasyncgenfunction(fn):
+        # Creating the generator does no work; hand it back as before
+        async def invoke_asyncgen(*args, **kwargs):
+            return fn(*args, **kwargs)
+
+        return invoke_asyncgen
+
+    async def invoke(*args, **kwargs):
+        res = await asyncio.to_thread(fn, *args, **kwargs)
+        if inspect.isawaitable(res):
+            return await res
+        return res
+
+    return invoke
+
+
 class ToolService:
     """Service for managing tools in Ghostpad."""
 
     def __init__(self):
         self.registry: Dict[str, Dict[str, Any]] = {}
+        # Indexes over the registry, kept in sync by load_tools and the toggles
+        self._enabled_ids: Set[str] = set()
+        self._enabled_tools: List[Dict[str, Any]] = []
+        self._enabled_feature_tools: List[Dict[str, Any]] = []
+        # tool id -> (conditions version, expiry, condition result) for get_tool_features,
+        # also filled by check_tool_conditions; stale once conditions are marked dirty
+        self._feature_condition_memo: Dict[str, Tuple[int, float, Any]] = {}
+        # (tool ids, tools used) -> rendered build_tool_prompt output
+        self._prompt_cache: Dict[Tuple[tuple, frozenset], str] = {}
+        self._module_to_ids: Dict[str, List[str]] = {}
+        self._handler_index: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        # Persisted ids that matched no loaded tool; kept so a flush doesn't drop them
+        self._unknown_enabled_ids: Set[str] = set()
+        # Sorted ids written to 'enabled_tools' (enabled plus unknown), updated in place
+        self._persisted_enabled: List[str] = []
+        self._enabled_flush_task: Optional[asyncio.Task] = None
+        self._enabled_dirty = False
+
+    def _rebuild_indexes(self) -> None:
+        """Recompute the registry indexes from the tools' enabled flags."""
+        self._enabled_ids = {tid for tid, t in self.registry.items() if t.get("enabled")}
+        self._module_to_ids = {}
+        for tool_id, tool in self.registry.items():
+            self._module_to_ids.setdefault(tool.get("module", ""), []).append(tool_id)
+        self._persisted_enabled = sorted(self._enabled_ids | self._unknown_enabled_ids)
+        self._refresh_enabled_indexes()
+
+    def _set_persisted_enabled(self, tool_id: str, enabled: bool) -> None:
+        """Add or remove one id in the sorted persisted list."""
+        ids = self._persisted_enabled
+        idx = bisect.bisect_left(ids, tool_id)
+        present = idx < len(ids) and ids[idx] == tool_id
+        if enabled and not present:
+            ids.insert(idx, tool_id)
+        elif not enabled and present:
+            del ids[idx]
+
+    def _refresh_enabled_indexes(self) -> None:
+        """Rebuild the enabled-tool list (registry order) and UI handler lookup after a toggle."""
+        enabled = self._enabled_ids
+        self._enabled_tools = [t for tid, t in self.registry.items() if tid in enabled]
+        self._enabled_feature_tools = [
+            t for t in self._enabled_tools if isinstance(t.get("ui_feature"), dict)
+        ]
+        self._feature_condition_memo = {}
+        self._prompt_cache = {}
+        # Newly enabled or disabled conditions change the feature set
+        state_service.mark_conditions_dirty()
+        handler_index: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        for tool in self._enabled_tools:
+            for handler_name, handler in (tool.get("ui_handlers") or {}).items():
+                # The first enabled tool (in registry order) providing a handler wins
+                handler_index.setdefault(handler_name, (handler, tool))
+        self._handler_index = handler_index
+
+    def _schedule_enabled_flush(self) -> None:
+        """Persist the enabled set shortly, coalescing bursts of toggles into one write."""
+        self._enabled_dirty = True
+        task = self._enabled_flush_task
+        if task is None or task.done():
+            self._enabled_flush_task = asyncio.create_task(self._flush_enabled())
+
+    async def _flush_enabled(self) -> None:
+        """Write the enabled tool ids to the KV store after a short coalescing window."""
+        # Toggles landing while a write is in flight trigger one more write
+        while self._enabled_dirty:
+            await asyncio.sleep(ENABLED_FLUSH_DELAY)
+            self._enabled_dirty = False
+            try:
+                await kv_store.set("enabled_tools", list(self._persisted_enabled))
+            except Exception as e:
+                logger.error(f"Failed to persist enabled tools: {e}")
+
+    async def flush_enabled_tools(self) -> None:
+        """Wait for a pending enabled_tools write (used at shutdown)."""
+        task = self._enabled_flush_task
+        if task is not None and not task.done():
+            await task
 
     def get_enabled_tools(self) -> List[Dict[str, Any]]:
         """Return enabled tool definitions from the in-memory registry."""
-        return [t for t in self.registry.values() if t.get("enabled")]
+        return list(self._enabled_tools)
 
     def build_tool_prompt(
         self, tools_used: List[str], tools: List[Dict[str, Any]]
     ) -> str:
         """Construct a tool availability prompt (excluding auto tools and respecting one_time)."""
+        key = (tuple(t.get("id") for t in tools), frozenset(tools_used))
+        cached = self._prompt_cache.get(key)
+        if cached is not None:
+            return cached
+
         lines = ["You have access to the following tool(s):"]
         for t in tools:
             if not callable(t.get("function")):
@@ -53,52 +250,47 @@ class ToolService:
         lines.append(
             "Use tool calls only when there is a good reason. If you have any tools which help you think or reason, use them often. When you have enough information to respond, stop making tool calls and respond to the user."
         )
-        return "\n".join(lines)
+        prompt = "\n".join(lines)
+        if len(self._prompt_cache) >= PROMPT_CACHE_SIZE:
+            self._prompt_cache.clear()
+        self._prompt_cache[key] = prompt
+        return prompt
 
     async def run_auto_tools_and_status(
         self, tools: List[Dict[str, Any]], conversation_id: str = None
     ) -> str:
         """Run auto tools (best-effort) and collect report_status results into a dashboard section."""
+        # Auto tools run first (concurrently), so each status reflects their effects
+        auto_tools = [
+            t for t in tools if t.get("auto_tool") and callable(t.get("function"))
+        ]
+        if auto_tools:
+            results = await asyncio.gather(
+                *(t["function_invoker"]() for t in auto_tools),
+                return_exceptions=True,
+            )
+            for res in results:
+                if isinstance(res, Exception):
+                    print(f"[Ghostpad] Auto Tool Error: {res}")
+
+        # Then every report_status runs concurrently; gather keeps the tool order
+        report_tools = [t for t in tools if callable(t.get("report_status"))]
+        results = await asyncio.gather(
+            *(
+                t["report_status_invoker"](conversation_id=conversation_id)
+                # Whether the report function accepts conversation_id is decided at load time
+                if t.get("report_supports_conversation_id")
+                else t["report_status_invoker"]()
+                for t in report_tools
+            ),
+            return_exceptions=True,
+        )
         status_lines: List[str] = []
-        for t in tools:
-            has_fn = callable(t.get("function"))
-            report = t.get("report_status")
-            has_report_status = callable(report)
-            if not has_fn and not has_report_status:
-                continue
-            if has_fn and t.get("auto_tool"):
-                tool_fn = t.get("function")
-                try:
-                    if inspect.iscoroutinefunction(tool_fn):
-                        await tool_fn()
-                    else:
-                        result = tool_fn()
-                        if inspect.iscoroutine(result):
-                            await result
-                except Exception as e:
-                    print(f"[Ghostpad] Auto Tool Error: {e}")
-            if has_report_status:
-                try:
-                    # Check if the report function accepts conversation_id
-                    sig = inspect.signature(report)
-                    if "conversation_id" in sig.parameters:
-                        if inspect.iscoroutinefunction(report):
-                            val = await report(conversation_id=conversation_id)
-                        else:
-                            val = report(conversation_id=conversation_id)
-                            if inspect.iscoroutine(val):
-                                val = await val
-                    else:
-                        if inspect.iscoroutinefunction(report):
-                            val = await report()
-                        else:
-                            val = report()
-                            if inspect.iscoroutine(val):
-                                val = await val
-                except Exception as e:
-                    val = f"(Status error: {e})"
-                if val:
-                    status_lines.append(str(val))
+        for val in results:
+            if isinstance(val, Exception):
+                val = f"(Status error: {val})"
+            if val:
+                status_lines.append(str(val))
         return (
             "\n---\n"
             + (
@@ -127,138 +319,131 @@ class ToolService:
 
         if not os.path.isdir(tools_dir):
             self.registry = registry
+            self._unknown_enabled_ids = enabled_set
+            self._rebuild_indexes()
             return
 
-        for root, dirs, files in os.walk(tools_dir):
-            for entry in files:
-                if not entry.endswith(".py"):
-                    continue
-                if entry.startswith("_"):
+        for module_path, module_name in _iter_tool_files(tools_dir):
+            try:
+                spec = importlib.util.spec_from_file_location(
+                    f"tools.{module_name}", module_path
+                )
+                if spec is None or spec.loader is None:
                     continue
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[spec.name] = module
+                # type: ignore[attr-defined]
+                spec.loader.exec_module(module)
+            except Exception as e:
+                print(f"[Ghostpad] Failed to load tool module {module_name}: {e}")
+                # Skip modules that fail to import
+                continue
 
-                # Create module name based on relative path from tools_dir
-                rel_path = os.path.relpath(root, tools_dir)
-                if rel_path == ".":
-                    module_name = entry[:-3]
-                else:
-                    # Replace path separators with dots for nested modules
-                    module_name = f"{rel_path.replace(os.sep, '.')}.{entry[:-3]}"
-
-                module_path = os.path.join(root, entry)
+            tools_list = getattr(module, "TOOLS", None)
+            if not isinstance(tools_list, list):
+                continue
 
+            for item in tools_list:
                 try:
-                    spec = importlib.util.spec_from_file_location(
-                        f"tools.{module_name}", module_path
+                    if not isinstance(item, dict):
+                        continue
+                    fn = item.get("function")
+                    schema = item.get("schema")
+                    auto_tool = bool(item.get("auto_tool", False))
+                    one_time = bool(item.get("one_time", False))
+                    report_status = item.get("report_status")
+                    ui_feature = item.get("ui_feature")
+                    ui_handlers = item.get("ui_handlers")
+                    condition = item.get("condition")
+
+                    if not isinstance(schema, dict):
+                        continue
+                    name = schema.get("name")
+                    description = schema.get("description", "")
+                    parameters = schema.get(
+                        "parameters",
+                        {"type": "object", "properties": {}, "required": []},
                     )
-                    if spec is None or spec.loader is None:
+                    if not isinstance(name, str) or not name:
+                        continue
+                    if callable(fn) and not isinstance(parameters, dict):
                         continue
-                    module = importlib.util.module_from_spec(spec)
-                    sys.modules[spec.name] = module
-                    # type: ignore[attr-defined]
-                    spec.loader.exec_module(module)
-                except Exception as e:
-                    print(f"[Ghostpad] Failed to load tool module {module_name}: {e}")
-                    # Skip modules that fail to import
-                    continue
-
-                tools_list = getattr(module, "TOOLS", None)
-                if not isinstance(tools_list, list):
-                    continue
 
-                for item in tools_list:
-                    try:
-                        if not isinstance(item, dict):
-                            continue
-                        fn = item.get("function")
-                        schema = item.get("schema")
-                        auto_tool = bool(item.get("auto_tool", False))
-                        one_time = bool(item.get("one_time", False))
-                        report_status = item.get("report_status")
-                        ui_feature = item.get("ui_feature")
-                        ui_handlers = item.get("ui_handlers")
-                        condition = item.get("condition")
-
-                        if not isinstance(schema, dict):
-                            continue
-                        name = schema.get("name")
-                        description = schema.get("description", "")
-                        parameters = schema.get(
-                            "parameters",
-                            {"type": "object", "properties": {}, "required": []},
-                        )
-                        if not isinstance(name, str) or not name:
-                            continue
-                        if callable(fn) and not isinstance(parameters, dict):
-                            continue
-
-                        tool_id = f"{module_name}.{name}"
-
-                        # Check if tool supports streaming and metadata by inspecting its signature
-                        supports_metadata = False
-                        try:
-                            sig = inspect.signature(fn)
-                            supports_metadata = "metadata" in sig.parameters
-                        except Exception:
-                            # If signature inspection fails, assume no streaming or metadata support
-                            supports_metadata = False
-
-                        registry[tool_id] = {
-                            "id": tool_id,
-                            "name": name,
-                            "description": description,
-                            "module": module_name,
-                            "function": fn,
-                            "report_status": (
-                                report_status if callable(report_status) else None
-                            ),
-                            "cleanup_function": (
-                                item.get("cleanup_function")
-                                if callable(item.get("cleanup_function"))
-                                else None
-                            ),
-                            "auto_tool": auto_tool,
-                            "one_time": one_time,
-                            "condition": condition if callable(condition) else None,
-                            "schema": {
-                                "name": name,
-                                "description": description,
-                                "parameters": parameters,
-                            },
-                            "enabled": tool_id in enabled_set,
-                            "ui_feature": (
-                                ui_feature if isinstance(ui_feature, dict) else None
-                            ),
-                            "ui_handlers": (
-                                ui_handlers if isinstance(ui_handlers, dict) else None
-                            ),
-                            "supports_metadata": supports_metadata,
+                    tool_id = f"{module_name}.{name}"
+                    tool_schema = {
+                        "name": name,
+                        "description": description,
+                        "parameters": parameters,
+                    }
+
+                    # Inspect signatures once here so calls never have to
+                    supports_metadata = _accepts_parameter(fn, "metadata")
+                    report_supports_conversation_id = callable(
+                        report_status
+                    ) and _accepts_parameter(report_status, "conversation_id")
+                    ui_handler_metadata = (
+                        {
+                            handler_name: _accepts_parameter(handler, "metadata")
+                            for handler_name, handler in ui_handlers.items()
                         }
-                    except Exception:
-                        continue
+                        if isinstance(ui_handlers, dict)
+                        else {}
+                    )
+
+                    registry[tool_id] = {
+                        "id": tool_id,
+                        "name": name,
+                        "description": description,
+                        "module": module_name,
+                        "function": fn,
+                        "report_status": (
+                            report_status if callable(report_status) else None
+                        ),
+                        "cleanup_function": (
+                            item.get("cleanup_function")
+                            if callable(item.get("cleanup_function"))
+                            else None
+                        ),
+                        "cleanup_awaitable_factory": _make_invoker(
+                            item.get("cleanup_function")
+                        ),
+                        # Coroutine adapters built once so calls skip the sync/async checks
+                        "function_invoker": _make_invoker(fn),
+                        "report_status_invoker": _make_invoker(report_status),
+                        "ui_handler_invokers": (
+                            {
+                                handler_name: _make_invoker(handler)
+                                for handler_name, handler in ui_handlers.items()
+                            }
+                            if isinstance(ui_handlers, dict)
+                            else {}
+                        ),
+                        "auto_tool": auto_tool,
+                        "one_time": one_time,
+                        "condition": condition if callable(condition) else None,
+                        "schema": tool_schema,
+                        # Chat completions tool entry, built once and shared by every request
+                        "api_tool": {"type": "function", "function": tool_schema},
+                        "enabled": tool_id in enabled_set,
+                        "ui_feature": (
+                            ui_feature if isinstance(ui_feature, dict) else None
+                        ),
+                        "ui_handlers": (
+                            ui_handlers if isinstance(ui_handlers, dict) else None
+                        ),
+                        "supports_metadata": supports_metadata,
+                        "report_supports_conversation_id": report_supports_conversation_id,
+                        "ui_handler_metadata": ui_handler_metadata,
+                    }
+                except Exception:
+                    continue
 
         self.registry = registry
-        try:
-            if not registry:
-                print("[Ghostpad] Tools: none found")
-            else:
-                print(f"[Ghostpad] Tools detected ({len(registry)}):")
-                for tool in sorted(registry.values(), key=lambda t: t["id"]):
-                    status = "enabled" if tool.get("enabled") else "disabled"
-                    flags = []
-                    if tool.get("auto_tool"):
-                        flags.append("auto")
-                    if tool.get("one_time"):
-                        flags.append("one-time")
-                    if tool.get("ui_feature"):
-                        flags.append("ui")
-                    if tool.get("supports_metadata"):
-                        flags.append("metadata")
-                    if tool.get("condition"):
-                        flags.append("conditional")
-                    flags_str = f" ({', '.join(flags)})" if flags else ""
-                    print(f"  - {tool['id']} [{status}]{flags_str}")
-        except Exception:
-            pass
+        self._unknown_enabled_ids = enabled_set - registry.keys()
+        self._rebuild_indexes()
+        # Skip building the listing entirely when INFO is filtered out
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("\n".join(_format_tools(registry)))
 
     def get_tools_registry(self) -> Dict[str, Dict[str, Any]]:
         """Get the tools registry."""
@@ -275,26 +460,22 @@ class ToolService:
 
         # Update in-memory
         self.registry[tool_id]["enabled"] = enabled
-
-        # Persist enabled set
-        enabled_ids: List[str] = await kv_store.get("enabled_tools", []) or []
-        enabled_set = set(enabled_ids)
         if enabled:
-            enabled_set.add(tool_id)
+            self._enabled_ids.add(tool_id)
         else:
-            enabled_set.discard(tool_id)
-        await kv_store.set("enabled_tools", sorted(enabled_set))
+            self._enabled_ids.discard(tool_id)
+        self._set_persisted_enabled(tool_id, enabled)
+        self._refresh_enabled_indexes()
+
+        # Persist enabled set (the in-memory set is the source of truth)
+        self._schedule_enabled_flush()
 
         return True
 
     async def toggle_file_tools(self, module_name: str, enabled: bool) -> bool:
         """Enable or disable all tools in a file."""
         # Find all tools in the specified module
-        tools_in_module = [
-            tool_id
-            for tool_id, tool in self.registry.items()
-            if tool.get("module", "") == module_name
-        ]
+        tools_in_module = self._module_to_ids.get(module_name, [])
 
         if not tools_in_module:
             return False
@@ -302,45 +483,62 @@ class ToolService:
         # Update all tools in the module
         for tool_id in tools_in_module:
             self.registry[tool_id]["enabled"] = enabled
-
-        # Persist enabled set
-        enabled_ids: List[str] = await kv_store.get("enabled_tools", []) or []
-        enabled_set = set(enabled_ids)
-
+        if enabled:
+            self._enabled_ids.update(tools_in_module)
+        else:
+            self._enabled_ids.difference_update(tools_in_module)
         for tool_id in tools_in_module:
-            if enabled:
-                enabled_set.add(tool_id)
-            else:
-                enabled_set.discard(tool_id)
+            self._set_persisted_enabled(tool_id, enabled)
+        self._refresh_enabled_indexes()
 
-        await kv_store.set("enabled_tools", sorted(enabled_set))
+        # Persist enabled set (the in-memory set is the source of truth)
+        self._schedule_enabled_flush()
 
         return True
 
     async def get_tool_features(self) -> List[Dict[str, Any]]:
         """List UI features derived from enabled tools."""
-        features: List[Dict[str, Any]] = []
-        for tool in self.registry.values():
-            if not tool.get("enabled"):
+        tools = self._enabled_feature_tools
+        if not tools:
+            return []
+
+        # Evaluate the conditions concurrently, reusing results younger than the TTL
+        # that were taken since conditions were last marked dirty
+        now = time.monotonic()
+        version = state_service.conditions_version
+        memo = self._feature_condition_memo
+        results_by_id: Dict[str, Any] = {}
+        pending = []
+        for tool in tools:
+            condition_fn = tool.get("condition")
+            if not callable(condition_fn):
                 continue
+            cached = memo.get(tool["id"])
+            if cached is not None and cached[0] == version and cached[1] > now:
+                results_by_id[tool["id"]] = cached[2]
+            else:
+                pending.append(tool)
+        if pending:
+            results = await asyncio.gather(
+                *(tool["condition"]() for tool in pending), return_exceptions=True
+            )
+            expires = time.monotonic() + FEATURE_CONDITION_TTL
+            for tool, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    print(f"Error checking condition for tool {tool.get('id')}: {result}")
+                    result = False  # Skip if condition check fails
+                results_by_id[tool["id"]] = result
+                memo[tool["id"]] = (version, expires, result)
 
-            # Check condition function if present
-            condition_fn = tool.get("condition")
-            if callable(condition_fn):
-                try:
-                    condition_result = await condition_fn()
-                    if not condition_result:
-                        continue  # Skip this tool's UI feature if condition fails
-                except Exception as e:
-                    print(f"Error checking condition for tool {tool.get('id')}: {e}")
-                    continue  # Skip if condition check fails
-
-            feat = tool.get("ui_feature")
-            if isinstance(feat, dict):
-                # attach source id for traceability
-                f = dict(feat)
-                f["source_tool_id"] = tool.get("id")
-                features.append(f)
+        features: List[Dict[str, Any]] = []
+        for tool in tools:
+            # Skip this tool's UI feature if its condition fails
+            if callable(tool.get("condition")) and not results_by_id[tool["id"]]:
+                continue
+            # attach source id for traceability
+            f = dict(tool["ui_feature"])
+            f["source_tool_id"] = tool.get("id")
+            features.append(f)
         return features
 
     def find_ui_handler(self, handler_name: str) -> Tuple[Any, Dict[str, Any]]:
@@ -349,14 +547,10 @@ class ToolService:
         Returns:
             Tuple of (handler_function, tool_dict) or raises ValueError if not found
         """
-        for tool in self.registry.values():
-            if not tool.get("enabled"):
-                continue
+        entry = self._handler_index.get(handler_name)
+        if entry is not None:
+            return entry
 
-            ui_handlers = tool.get("ui_handlers", {})
-            if ui_handlers and handler_name in ui_handlers:
-                return ui_handlers[handler_name], tool
-        
         raise ValueError(f"UI handler '{handler_name}' not found in any enabled tool")
 
     async def execute_ui_handler(self, handler_name: str, params: Dict[str, Any], conversation_id: str = None) -> Any:
@@ -370,32 +564,22 @@ class ToolService:
         Returns:
             The result of the handler execution
         """
-        handler_function, _ = self.find_ui_handler(handler_name)
-        
-        # Create metadata object consistent with chat_service.py
-        metadata = {
-            "conversation_id": conversation_id,
-            "timestamp": datetime.now().isoformat(),
-        }
-
-        # Execute the handler function with metadata support
-        sig = inspect.signature(handler_function)
-        supports_metadata = "metadata" in sig.parameters
-
-        if inspect.iscoroutinefunction(handler_function):
-            if supports_metadata:
-                result = await handler_function(params, metadata)
-            else:
-                result = await handler_function(params)
-        else:
-            if supports_metadata:
-                result = handler_function(params, metadata)
-            else:
-                result = handler_function(params)
-            if inspect.iscoroutine(result):
-                result = await result
+        handler_function, tool = self.find_ui_handler(handler_name)
+
+        # Execute the handler function with metadata support (signature checked at load time)
+        supports_metadata = tool.get("ui_handler_metadata", {}).get(handler_name, False)
 
-        return result
+        invoke = tool.get("ui_handler_invokers", {}).get(handler_name) or _make_invoker(
+            handler_function
+        )
+        if supports_metadata:
+            # Create metadata object consistent with chat_service.py
+            metadata = {
+                "conversation_id": conversation_id,
+                "timestamp": _current_timestamp(),
+            }
+            return await invoke(params, metadata)
+        return await invoke(params)
 
     def get_tools_list(self) -> List[Dict[str, Any]]:
         """Get list of tools formatted for API response."""
@@ -461,56 +645,67 @@ class ToolService:
 
     async def cleanup_tools(self):
         """Run cleanup functions from enabled tools."""
-        enabled_tools = self.get_enabled_tools()
-        for t in enabled_tools:
-            cleanup_fn = t.get("cleanup_function")
-            if callable(cleanup_fn):
-                try:
-                    if inspect.iscoroutinefunction(cleanup_fn):
-                        await cleanup_fn()
-                    else:
-                        res = cleanup_fn()
-                        if inspect.iscoroutine(res):
-                            await res
-                except Exception as ce:
-                    print(
-                        f"[Ghostpad] Cleanup function error for tool {t.get('schema', {}).get('name')}: {ce}"
-                    )
+        await run_tool_cleanups(self.get_enabled_tools())
+
+    @property
+    def conditions_dirty(self) -> asyncio.Event:
+        """Event that wakes check_tool_conditions."""
+        return state_service.conditions_dirty
+
+    def mark_conditions_dirty(self) -> None:
+        """Signal that tool conditions may have changed (for tools whose state lives outside the KV store)."""
+        state_service.mark_conditions_dirty()
 
     async def check_tool_conditions(self):
-        """Periodically check all tool condition functions and emit events when they change."""
+        """Check all tool condition functions when signalled (or after a fallback interval) and emit events when they change.
+
+        KV writes seen by the state service's watcher and tool toggles mark conditions dirty.
+        """
+        dirty = self.conditions_dirty
 
         while True:
             try:
-                await asyncio.sleep(1)  # Check every second
+                try:
+                    await asyncio.wait_for(dirty.wait(), timeout=CONDITION_FALLBACK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                # Cleared before evaluating, so a change during the checks triggers another pass
+                dirty.clear()
+                version = state_service.conditions_version
 
-                registry = self.get_tools_registry()
                 changes_detected = False
 
-                for tool_id, tool in registry.items():
-                    if not tool.get("enabled"):
-                        continue
-
-                    condition_fn = tool.get("condition")
-                    if not callable(condition_fn):
+                items = [
+                    (tool["id"], tool["condition"])
+                    for tool in self._enabled_tools
+                    if callable(tool.get("condition"))
+                ]
+                # Evaluate every condition concurrently so one slow check can't stall the rest
+                results = await asyncio.gather(
+                    *(condition_fn() for _, condition_fn in items),
+                    return_exceptions=True,
+                )
+                # Share the fresh results with get_tool_features, so the UI's refetch
+                # after features_changed sees exactly what triggered it
+                expires = time.monotonic() + FEATURE_CONDITION_TTL
+                memo = self._feature_condition_memo
+
+                for (tool_id, _), current_result in zip(items, results):
+                    if isinstance(current_result, Exception):
+                        logger.error(
+                            f"Error checking condition for tool {tool_id}: {current_result}"
+                        )
                         continue
+                    memo[tool_id] = (version, expires, current_result)
 
-                    try:
-                        current_result = await condition_fn()
-
-                        previous_result = state_service.condition_results_cache.get(tool_id)
-
-                        # Check if condition result changed
-                        if previous_result != current_result:
-                            state_service.condition_results_cache[tool_id] = current_result
-                            changes_detected = True
-                            logger.info(
-                                f"Condition changed for tool {tool_id}: {previous_result} -> {current_result}"
-                            )
+                    previous_result = state_service.condition_results_cache.get(tool_id)
 
-                    except Exception as e:
-                        logger.error(
-                            f"Error checking condition for tool {tool_id}: {e}"
+                    # Check if condition result changed
+                    if previous_result != current_result:
+                        state_service.condition_results_cache[tool_id] = current_result
+                        changes_detected = True
+                        logger.info(
+                            f"Condition changed for tool {tool_id}: {previous_result} -> {current_result}"
                         )
 
                 if changes_detected:
@@ -528,5 +723,21 @@ class ToolService:
                 await asyncio.sleep(5)  # Back off on error
 
 
+async def run_tool_cleanups(tools: List[Dict[str, Any]]) -> None:
+    """Run the cleanup functions of the given tools concurrently, logging failures."""
+    cleanup_tools = [t for t in tools if t.get("cleanup_awaitable_factory")]
+    if not cleanup_tools:
+        return
+    results = await asyncio.gather(
+        *(t["cleanup_awaitable_factory"]() for t in cleanup_tools),
+        return_exceptions=True,
+    )
+    for t, res in zip(cleanup_tools, results):
+        if isinstance(res, Exception):
+            print(
+                f"[Ghostpad] Cleanup function error for tool {t.get('schema', {}).get('name')}: {res}"
+            )
+
+
 # Global tool service instance
 tool_service = ToolService()
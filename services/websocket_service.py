@@ -8,23 +8,29 @@ This module provides WebSocket connection management including:
 - Automatic cleanup on disconnect
 """
 
-import json
 import asyncio
 import logging
-from typing import Dict, Set, List, Optional, Any
+import time
+from collections import defaultdict
+from typing import DefaultDict, Dict, FrozenSet, Set, List, Optional, Any
 from dataclasses import dataclass, field
 from fastapi import WebSocket, WebSocketDisconnect
 
+from utils.json_utils import dumps
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(eq=False)
 class WebSocketConnection:
-    """Represents a WebSocket connection with subscription info."""
+    """Represents a WebSocket connection with subscription info.
+
+    Compared and hashed by identity so connections can sit in topic sets.
+    """
     websocket: WebSocket
     client_id: str
     subscriptions: Set[str] = field(default_factory=set)
-    connected_at: float = field(default_factory=asyncio.get_event_loop().time)
+    connected_at: float = field(default_factory=time.monotonic)
 
 
 class KVWebSocketManager:
@@ -33,9 +39,11 @@ class KVWebSocketManager:
     def __init__(self):
         # Active connections by client_id
         self.connections: Dict[str, WebSocketConnection] = {}
-        # Topic subscriptions: topic -> set of client_ids
-        self.subscriptions: Dict[str, Set[str]] = {}
-        # Lock for thread-safe operations
+        # Topic subscriptions: topic -> set of connections (broadcasts need no id lookups).
+        # Reads go through .get() so they never create empty topics.
+        self.subscriptions: DefaultDict[str, Set[WebSocketConnection]] = defaultdict(set)
+        # Guards connection lifecycle (connect/disconnect); reads and
+        # subscription changes never await, so they don't need it
         self._lock = asyncio.Lock()
     
     async def connect(self, websocket: WebSocket, client_id: str) -> WebSocketConnection:
@@ -47,6 +55,10 @@ class KVWebSocketManager:
                 websocket=websocket,
                 client_id=client_id
             )
+            previous = self.connections.get(client_id)
+            if previous:
+                # A reconnect under the same id replaces the old socket and its subscriptions
+                self._drop_subscriptions(previous)
             self.connections[client_id] = connection
             
         logger.info(f"WebSocket client {client_id} connected. Total connections: {len(self.connections)}")
@@ -60,116 +72,95 @@ class KVWebSocketManager:
                 return
             
             # Remove from all subscriptions
-            for topic in connection.subscriptions:
-                self._unsubscribe_from_topic(client_id, topic)
+            self._drop_subscriptions(connection)
                 
         logger.info(f"WebSocket client {client_id} disconnected. Total connections: {len(self.connections)}")
     
+    async def _disconnect_connection(self, connection: WebSocketConnection):
+        """Disconnect a specific connection, unless its client id has since reconnected."""
+        if self.connections.get(connection.client_id) is connection:
+            await self.disconnect(connection.client_id)
+        else:
+            self._drop_subscriptions(connection)
+    
     async def subscribe(self, client_id: str, topic: str) -> bool:
         """Subscribe a client to a topic."""
-        async with self._lock:
-            connection = self.connections.get(client_id)
-            if not connection:
-                return False
-            
-            # Add to client's subscriptions
-            connection.subscriptions.add(topic)
-            
-            # Add to topic subscriptions
-            if topic not in self.subscriptions:
-                self.subscriptions[topic] = set()
-            self.subscriptions[topic].add(client_id)
-            
+        # No awaits below, so this runs atomically on the event loop without the lock
+        connection = self.connections.get(client_id)
+        if not connection:
+            return False
+        
+        # Add to client's subscriptions
+        connection.subscriptions.add(topic)
+        
+        # Add to topic subscriptions
+        self.subscriptions[topic].add(connection)
+        
         logger.debug(f"Client {client_id} subscribed to topic '{topic}'")
         return True
     
     async def unsubscribe(self, client_id: str, topic: str) -> bool:
         """Unsubscribe a client from a topic."""
-        async with self._lock:
-            connection = self.connections.get(client_id)
-            if not connection:
-                return False
-            
-            self._unsubscribe_from_topic(client_id, topic)
-            
+        connection = self.connections.get(client_id)
+        if not connection:
+            return False
+        
+        connection.subscriptions.discard(topic)
+        self._remove_from_topic(connection, topic)
+        
         logger.debug(f"Client {client_id} unsubscribed from topic '{topic}'")
         return True
     
-    def _unsubscribe_from_topic(self, client_id: str, topic: str):
-        """Internal method to unsubscribe from a topic (assumes lock is held)."""
-        connection = self.connections.get(client_id)
-        if connection:
-            connection.subscriptions.discard(topic)
-        
-        if topic in self.subscriptions:
-            self.subscriptions[topic].discard(client_id)
-            if not self.subscriptions[topic]:
+    def _remove_from_topic(self, connection: WebSocketConnection, topic: str):
+        """Internal method to take a connection out of a topic's set (must not await, so it stays atomic)."""
+        subscribers = self.subscriptions.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
                 del self.subscriptions[topic]
     
+    def _drop_subscriptions(self, connection: WebSocketConnection):
+        """Remove a connection from every topic it subscribed to."""
+        for topic in connection.subscriptions:
+            self._remove_from_topic(connection, topic)
+        connection.subscriptions.clear()
+    
+    async def _send_to_connections(self, connections, message_json: str):
+        """Send a serialized message to several connections concurrently, dropping any that fail."""
+        # A slow client only delays its own send, not everyone else's
+        results = await asyncio.gather(
+            *(connection.websocket.send_text(message_json) for connection in connections),
+            return_exceptions=True,
+        )
+        disconnected = []
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to send message to client {connection.client_id}: {result}")
+                disconnected.append(connection)
+        
+        # Clean up disconnected clients
+        for connection in disconnected:
+            await self._disconnect_connection(connection)
+    
     async def broadcast_to_topic(self, topic: str, message: Dict[str, Any]):
         """Broadcast a message to all clients subscribed to a topic."""
-        async with self._lock:
-            client_ids = self.subscriptions.get(topic, set()).copy()
+        # Tuple snapshot without the lock; concurrent broadcasts don't serialize on each other
+        connections = tuple(self.subscriptions.get(topic, ()))
         
-        # Debug logging for monster HP or any key containing "monster" or "hp"
-        if "monster" in topic.lower() or "hp" in topic.lower():
-            print(f"🎯 Broadcasting to topic '{topic}': {len(client_ids)} subscribers")
-            print(f"   Message: {message}")
-            print(f"   Subscribers: {client_ids}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Broadcasting to topic '%s': %d subscribers", topic, len(connections))
         
-        if not client_ids:
-            if "monster" in topic.lower() or "hp" in topic.lower():
-                print(f"❌ No subscribers for topic '{topic}'")
+        if not connections:
             return
         
-        message_json = json.dumps(message)
-        disconnected_clients = []
-        
-        # Send to all subscribed clients
-        for client_id in client_ids:
-            connection = self.connections.get(client_id)
-            if not connection:
-                disconnected_clients.append(client_id)
-                continue
-            
-            try:
-                await connection.websocket.send_text(message_json)
-                # Debug logging for monster HP
-                if "monster" in topic.lower() or "hp" in topic.lower():
-                    print(f"✅ Sent {topic} update to client {client_id}")
-            except Exception as e:
-                logger.warning(f"Failed to send message to client {client_id}: {e}")
-                if "monster" in topic.lower() or "hp" in topic.lower():
-                    print(f"❌ Failed to send {topic} update to client {client_id}: {e}")
-                disconnected_clients.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            await self.disconnect(client_id)
+        # Serialized once and shared by every send (text frames: the client parses strings)
+        await self._send_to_connections(connections, dumps(message))
     
     async def broadcast_to_all(self, message: Dict[str, Any]):
         """Broadcast a message to all connected clients."""
-        async with self._lock:
-            client_ids = list(self.connections.keys())
-        
-        message_json = json.dumps(message)
-        disconnected_clients = []
+        connections = tuple(self.connections.values())
         
-        for client_id in client_ids:
-            connection = self.connections.get(client_id)
-            if not connection:
-                disconnected_clients.append(client_id)
-                continue
-            
-            try:
-                await connection.websocket.send_text(message_json)
-            except Exception as e:
-                logger.warning(f"Failed to send message to client {client_id}: {e}")
-                disconnected_clients.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected_clients:
-            await self.disconnect(client_id)
+        await self._send_to_connections(connections, dumps(message))
     
     async def send_to_client(self, client_id: str, message: Dict[str, Any]) -> bool:
         """Send a message to a specific client."""
@@ -178,7 +169,7 @@ class KVWebSocketManager:
             return False
         
         try:
-            message_json = json.dumps(message)
+            message_json = dumps(message)
             await connection.websocket.send_text(message_json)
             return True
         except Exception as e:
@@ -190,14 +181,14 @@ class KVWebSocketManager:
         """Get the number of active connections."""
         return len(self.connections)
     
-    def get_topic_subscribers(self, topic: str) -> Set[str]:
-        """Get the set of client IDs subscribed to a topic."""
-        return self.subscriptions.get(topic, set()).copy()
+    def get_topic_subscribers(self, topic: str) -> FrozenSet[str]:
+        """Get a snapshot of the client IDs subscribed to a topic."""
+        return frozenset(connection.client_id for connection in self.subscriptions.get(topic, ()))
     
-    def get_client_subscriptions(self, client_id: str) -> Set[str]:
-        """Get the topics a client is subscribed to."""
+    def get_client_subscriptions(self, client_id: str) -> FrozenSet[str]:
+        """Get a snapshot of the topics a client is subscribed to."""
         connection = self.connections.get(client_id)
-        return connection.subscriptions.copy() if connection else set()
+        return frozenset(connection.subscriptions) if connection else frozenset()
 
 
 # Global instance
@@ -1,23 +1,33 @@
 from services.ai_service import ai_service
+from services.chat_service import chat_service
 from services.kv_store_service import kv_store
 from utils.constants import ERROR_NO_OPENAI_API_KEY
-import openai
+from collections import OrderedDict
+import asyncio
+import time
 
+# Generated pages are reused for revisits of the same URL on the same model
+PAGE_CACHE_SIZE = 512
+PAGE_CACHE_TTL = 3600  # seconds
 
-async def visit_url(params):
-    """UI handler for simulating web browser and generating HTML"""
+# Minimum seconds between partial page_html writes while a page streams in
+PAGE_PUBLISH_INTERVAL = 0.05
 
-    url = params.get("url_input", "")
-    if not url:
-        return {"success": False, "error": "URL is required"}
+# Page generations allowed to run against the API at once
+MAX_CONCURRENT_PAGES = 4
 
-    try:
-        ai_settings = await ai_service.get_openai_settings()
-        if not ai_settings["api_key"]:
-            return {"success": False, "error": ERROR_NO_OPENAI_API_KEY}
+_generation_slots = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+# cache key -> task generating that page, so concurrent visits share one request
+_inflight_pages: dict = {}
+
+# Page key of the most recent visit; only that page may write page_html
+_latest_page_key = None
+
+# (base_url, model, url) -> (expiry, html), least recently used first
+_page_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
 
-        # Create prompt for web page simulation
-        prompt = f"""You are simulating a web browser visiting the URL: {url}
+BROWSER_INSTRUCTIONS = """You are simulating a web browser. The user message gives the URL being visited.
 
 The web pages you deliver are realistic depictions of their real-world counterparts, but simulated and parodied.
 
@@ -34,20 +44,121 @@ Generate an HTML document that represents what this webpage might contain. The o
 
 Generate only the HTML code, no explanations. Do NOT wrap the HTML in code tags or markdown syntax."""
 
-        openai.api_key = ai_settings["api_key"]
-        if ai_settings.get("base_url"):
-            openai.base_url = ai_settings["base_url"]
 
-        response = openai.chat.completions.create(
-            model=ai_settings["model_name"],
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=2000
-        )
+def _get_cached_page(key):
+    """Return cached HTML for a page key, or None when missing or expired."""
+    entry = _page_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        del _page_cache[key]
+        return None
+    _page_cache.move_to_end(key)
+    return entry[1]
+
+
+def _cache_page(key, html):
+    """Store generated HTML, evicting the least recently used page when full."""
+    _page_cache[key] = (time.monotonic() + PAGE_CACHE_TTL, html)
+    _page_cache.move_to_end(key)
+    if len(_page_cache) > PAGE_CACHE_SIZE:
+        _page_cache.popitem(last=False)
+
+
+async def _publish_page(cache_key, html):
+    """Write page_html, unless the user has since asked for a different page."""
+    if _latest_page_key == cache_key:
+        await kv_store.set("page_html", html)
 
-        html_content = response.choices[0].message.content
 
-        await kv_store.set("page_html", html_content)
+async def _generate_page(ai_settings, url, cache_key):
+    """Stream a page for url into page_html and cache it; returns the HTML."""
+    # Put back if this generation fails after it started overwriting the page
+    previous_html = await kv_store.get("page_html", "")
+    parts = []
+    try:
+        async with _generation_slots:
+            # Shared async client (pooled connections, no global openai state to race on),
+            # held only while this page generates so a settings change can't close it
+            client = await chat_service.acquire_openai_client(
+                ai_settings["api_key"], ai_settings.get("base_url") or None
+            )
+            try:
+                stream = await client.chat.completions.create(
+                    model=ai_settings["model_name"],
+                    # Static instructions first so every visit shares the same prompt prefix
+                    messages=[
+                        {"role": "system", "content": BROWSER_INSTRUCTIONS},
+                        {"role": "user", "content": f"Visit: {url}"},
+                    ],
+                    temperature=0.2,
+                    max_tokens=1200,
+                    stream=True,
+                )
+
+                # Publish the partial page as it arrives so the renderer can paint early
+                last_publish = time.monotonic()
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    parts.append(delta)
+                    now = time.monotonic()
+                    if now - last_publish >= PAGE_PUBLISH_INTERVAL:
+                        last_publish = now
+                        await _publish_page(cache_key, "".join(parts))
+            finally:
+                await chat_service.release_openai_client(client)
+    except Exception:
+        if parts:
+            await _publish_page(cache_key, previous_html)
+        raise
+
+    html_content = "".join(parts)
+    await _publish_page(cache_key, html_content)
+    if html_content:
+        _cache_page(cache_key, html_content)
+    return html_content
+
+
+def _forget_inflight(cache_key, task):
+    """Drop a finished generation from the in-flight map."""
+    if _inflight_pages.get(cache_key) is task:
+        del _inflight_pages[cache_key]
+
+
+async def visit_url(params):
+    """UI handler for simulating web browser and generating HTML"""
+    global _latest_page_key
+
+    url = params.get("url_input", "")
+    if not url:
+        return {"success": False, "error": "URL is required"}
+
+    try:
+        ai_settings = await ai_service.get_openai_settings()
+        if not ai_settings["api_key"]:
+            return {"success": False, "error": ERROR_NO_OPENAI_API_KEY}
+
+        cache_key = (ai_settings.get("base_url") or "", ai_settings["model_name"], url)
+        # Pages still generating for earlier visits stop writing page_html
+        _latest_page_key = cache_key
+
+        html_content = _get_cached_page(cache_key)
+        if html_content is not None:
+            await _publish_page(cache_key, html_content)
+            return {"success": True, "message": f"Generated webpage for {url}"}
+
+        # Visits of a page that is already generating share that generation
+        task = _inflight_pages.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(_generate_page(ai_settings, url, cache_key))
+            _inflight_pages[cache_key] = task
+            task.add_done_callback(lambda t: _forget_inflight(cache_key, t))
+        # Shielded so one caller going away doesn't cancel the page for the others
+        await asyncio.shield(task)
 
         return {"success": True, "message": f"Generated webpage for {url}"}
 
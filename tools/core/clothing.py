@@ -34,7 +34,8 @@ async def wear_clothing(item_name: str, metadata=None) -> AsyncGenerator[object,
         return
         
     key = get_clothing_key(conversation_id)
-    current_equipped = await kv_store.get(key, DEFAULT_OUTFIT)
+    # Read and write in one step; nothing is written if the item is already on
+    current_equipped = await kv_store.get_and_set(key, item_name, DEFAULT_OUTFIT)
 
     if current_equipped == item_name:
         yield system_chunk(f"👕 *[[char]] is already wearing '{item_name}'!*\n\n")
@@ -43,8 +44,6 @@ async def wear_clothing(item_name: str, metadata=None) -> AsyncGenerator[object,
     yield system_chunk(f"👔 *Getting ready to change into '{item_name}'...* \n\n")
     yield system_chunk("**Rustle rustle...**\n\n")
 
-    await kv_store.set(key, item_name)
-
     yield system_chunk(f"✨ *Perfect! [[char]] is now wearing '{item_name}'!*\n\n")
 
 
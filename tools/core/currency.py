@@ -90,8 +90,7 @@ async def send_money(sender: str, recipient: str, amount: int, user_requested=Fa
     sender_balance -= amount
     recipient_balance += amount
 
-    await kv_store.set(sender_key, sender_balance)
-    await kv_store.set(recipient_key, recipient_balance)
+    await kv_store.set_many({sender_key: sender_balance, recipient_key: recipient_balance})
 
     yield system_chunk(f"💵 [Transaction Successful] {sender} sent ${amount} to {recipient}.\n\n")
 
@@ -139,8 +138,7 @@ async def steal_money(thief: str, victim: str, amount: int) -> AsyncGenerator[ob
     thief_balance += amount
     victim_balance -= amount
 
-    await kv_store.set(thief_key, thief_balance)
-    await kv_store.set(victim_key, victim_balance)
+    await kv_store.set_many({thief_key: thief_balance, victim_key: victim_balance})
 
     yield system_chunk(f"💵 [Theft Successful] {thief} has hacked into {victim}'s account and stolen ${amount}!\n\n")
 
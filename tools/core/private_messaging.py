@@ -11,12 +11,11 @@ async def get_user_name() -> str:
 
 
 async def check_private_messages():
-    has_any = (await kv_store.llen("private_chat")) > 0
-    if not has_any:
+    messages = await kv_store.lrange("private_chat", -2, -1)
+    if not messages:
         return ""
 
     user_name = await get_user_name()
-    messages = await kv_store.lrange("private_chat", -2, -1)
     formatted = "\n".join(
         (msg if ":" in msg[:20] or msg[0] == "*" else f"{user_name}: {msg}")
         for msg in messages
@@ -0,0 +1,41 @@
+"""
+JSON helpers for Ghostpad.
+
+Uses orjson when it is installed (much faster for the small, frequent payloads
+we emit while streaming and store in the KV store) and falls back to the
+standard library otherwise.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize obj to compact UTF-8 encoded JSON."""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+    def dumps(obj: Any) -> str:
+        """Serialize obj to a compact JSON string."""
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+
+    loads = orjson.loads
+
+else:
+
+    def dumps(obj: Any) -> str:
+        """Serialize obj to a compact JSON string."""
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize obj to compact UTF-8 encoded JSON."""
+        return dumps(obj).encode()
+
+    loads = json.loads
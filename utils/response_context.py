@@ -50,4 +50,25 @@ class ResponseContext:
         Returns:
             The accumulated system content
         """
-        return "".join(self._inference_context.get("system_streamed_content", []))
\ No newline at end of file
+        return "".join(self._inference_context.get("system_streamed_content", []))
+    
+    def reset(self, final_content: str = "") -> None:
+        """
+        Clear accumulated content so the context can be reused for another tool call.
+        
+        Args:
+            final_content: The response content generated so far in the current turn
+        """
+        self._final_content = ""
+        self._inference_context["tool_streamed_content"].clear()
+        self._inference_context["system_streamed_content"].clear()
+        self._inference_context["final_content"] = final_content
+    
+    def get_inference_context(self) -> Dict[str, Any]:
+        """
+        Get the inference loop's context variables this response context writes into.
+        
+        Returns:
+            The shared inference loop context
+        """
+        return self._inference_context